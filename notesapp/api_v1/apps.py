@@ -3,3 +3,16 @@ from django.apps import AppConfig
 
 class ApiV1Config(AppConfig):
     name = 'api_v1'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .helpers.fast_read import compile_serializers
+        from .helpers.instrumentation import install_query_timer
+        from .serializers import CategorySerializer, NotesModelSerializer, PersonModelSerializer
+
+        # read-only list endpoints of these serializers use the compiled fast path
+        compile_serializers(CategorySerializer, NotesModelSerializer, PersonModelSerializer)
+        # query count and time of sampled requests (see InstrumentationMiddleware)
+        connection_created.connect(install_query_timer, dispatch_uid='api_v1_query_timer')
@@ -0,0 +1,99 @@
+'''
+Benchmarks run with `python manage.py benchmark <name>`.
+
+Each benchmark module exposes `run(rows)` returning a list of result dicts.
+Everything a benchmark writes is rolled back when it finishes.
+'''
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.throttling import SimpleRateThrottle
+
+from api_v1.helpers.throttles import UserThrottlePerMinute
+
+# compared between runs by `benchmark --compare`; lower is better for all of them.
+# p95 is reported but not compared: over a few repeats it is one outlier.
+COMPARED_METRICS = ('seconds', 'p50_ms', 'queries', 'peak_kib')
+# timing differences below this many milliseconds are noise, whatever the ratio
+TIMING_NOISE_MS = 1.0
+
+
+@contextmanager
+def rolled_back():
+    '''
+    Runs the block in a transaction that is always rolled back.
+    '''
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class Timer():
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.perf_counter() - self.start
+
+
+def result(name, rows, seconds, **extra):
+    return dict(name=name, rows=rows, seconds=round(seconds, 4),
+                rows_per_second=round(rows / seconds, 1) if seconds else None, **extra)
+
+
+def request_factory():
+    # `localhost` is always allowed while DEBUG is on, unlike the test client's `testserver`
+    return APIRequestFactory(SERVER_NAME='localhost')
+
+
+def api_client():
+    return APIClient(SERVER_NAME='localhost')
+
+
+@contextmanager
+def measured_settings():
+    '''
+    Lets every request do its full work: throttles still run but never refuse,
+    the response cache never hits and no request is instrumented.
+    '''
+    unthrottled = {scope: '1000000/minute' for scope in SimpleRateThrottle.THROTTLE_RATES}
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, unthrottled))
+        stack.enter_context(mock.patch.object(UserThrottlePerMinute, 'rate', '1000000/minute'))
+        stack.enter_context(override_settings(RESPONSE_CACHE_TIMEOUT=0, INSTRUMENTATION_SAMPLE_RATE=0))
+        yield
+
+
+def compare(results, baseline, threshold):
+    '''
+    Returns the regressions of `results` against `baseline` (both lists of result
+    dicts, matched on name and rows) as dicts of name, rows, metric, baseline and
+    current values. Query counts regress on any increase, other metrics when they
+    grow by more than `threshold` (0.1 is 10%).
+    '''
+    previous = {(row['name'], row['rows']): row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get((row['name'], row['rows']))
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), row.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'queries':
+                regressed = new > old
+            else:
+                regressed = new > old * (1 + threshold)
+                if metric in ('seconds', 'p50_ms'):
+                    scale = 1000 if metric == 'seconds' else 1
+                    regressed = regressed and (new - old) * scale >= TIMING_NOISE_MS
+            if regressed:
+                regressions.append(dict(name=row['name'], rows=row['rows'], metric=metric, baseline=old, current=new))
+    return regressions
@@ -0,0 +1,37 @@
+'''
+Compares creating notes one request at a time with the `notes/bulk/` endpoint.
+'''
+from api_v1.models import Category
+from api_v1.views.Notes import NotesViewSet
+
+from . import Timer, request_factory, result, rolled_back
+
+
+def note_payloads(category, rows):
+    return [{'title': 'note %d' % i, 'body': 'body %d' % i, 'category': category.pk} for i in range(rows)]
+
+
+def run(rows):
+    factory = request_factory()
+    create = NotesViewSet.as_view({'post': 'create'}, throttle_classes=[])
+    bulk = NotesViewSet.as_view({'post': 'bulk'}, throttle_classes=[])
+    results = []
+
+    with rolled_back():
+        category = Category.objects.create(name='benchmark category')
+        payloads = note_payloads(category, rows)
+        with Timer() as timer:
+            for payload in payloads:
+                response = create(factory.post('/api_v1/notes/', payload, format='json'))
+                assert response.status_code == 201, response.data
+        results.append(result('notes single-item create', rows, timer.seconds))
+
+    with rolled_back():
+        category = Category.objects.create(name='benchmark category')
+        payloads = note_payloads(category, rows)
+        with Timer() as timer:
+            response = bulk(factory.post('/api_v1/notes/bulk/', payloads, format='json'))
+            assert response.status_code == 201, response.data
+        results.append(result('notes bulk create', rows, timer.seconds))
+
+    return results
@@ -0,0 +1,76 @@
+'''
+Compression ratio and CPU cost of every available coding on the responses of
+the list endpoints, and what a response cache hit costs with the body
+compressed on the way out against the precompressed variant of the entry.
+'''
+import time
+
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from api_v1.helpers.compression import available_codings, compress
+from api_v1.models import Category, Notes
+
+from . import Timer, api_client, measured_settings, result, rolled_back
+
+REPEAT = 5
+ENDPOINTS = [
+    ('generics categories', 'api_v1:generics_categories'),
+    ('categories viewset', 'api_v1:categories-ViewSet-list'),
+    ('notes list', 'api_v1:notes-ViewSet-list'),
+]
+
+
+def seed(rows):
+    categories = Category.objects.bulk_create(
+        [Category(name='compression sport %d' % i) for i in range(max(rows // 10, 1))]
+    )
+    Notes.objects.bulk_create(
+        [Notes(title='note %d' % i, body='body of the note %d' % i, category=categories[i % len(categories)])
+         for i in range(rows)]
+    )
+
+
+def timed_hits(client, url, coding):
+    latencies = []
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT_ENCODING=coding)
+        latencies.append(time.perf_counter() - start)
+        assert response['X-Cache'] == 'HIT' and response['Content-Encoding'] == coding
+    return sorted(latencies)[REPEAT // 2]
+
+
+def run(rows):
+    client = api_client()
+    results = []
+    with rolled_back(), measured_settings():
+        seed(rows)
+        for name, url_name in ENDPOINTS:
+            url = reverse(url_name)
+            content = client.get(url).content
+            for coding in available_codings():
+                with Timer() as timer:
+                    for i in range(REPEAT):
+                        compressed = compress(content, coding)
+                seconds = timer.seconds / REPEAT
+                results.append(result('%s %s' % (name, coding), rows, seconds, bytes=len(content),
+                                      compressed_bytes=len(compressed), ratio=round(len(content) / len(compressed), 2),
+                                      cpu_ms=round(seconds * 1000, 3)))
+
+        # cache hits of the largest response, with the response cache turned back on
+        name, url_name = ENDPOINTS[1]
+        url = reverse(url_name)
+        with override_settings(RESPONSE_CACHE_TIMEOUT=300):
+            for coding in available_codings():
+                client.get(url, HTTP_ACCEPT_ENCODING=coding)
+                precompressed = timed_hits(client, url, coding)
+                with override_settings(RESPONSE_COMPRESSION_CODINGS=[coding]):
+                    # entries filled without variants are compressed on every hit
+                    with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=float('inf')):
+                        Category.objects.first().save()
+                        client.get(url, HTTP_ACCEPT_ENCODING=coding)
+                    on_the_way_out = timed_hits(client, url, coding)
+                results.append(result('%s %s cache hit precompressed' % (name, coding), rows, precompressed))
+                results.append(result('%s %s cache hit compressed per hit' % (name, coding), rows, on_the_way_out))
+    return results
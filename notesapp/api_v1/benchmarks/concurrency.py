@@ -0,0 +1,177 @@
+'''
+Load test of the sync views under WSGI against the async views under ASGI.
+
+Both applications run in-process with the full middleware stack. WSGI requests
+are served by a pool of `WSGI_THREADS` threads, like one threaded worker; ASGI
+requests are coroutines on a single event loop. `CLIENTS` clients start at
+once, and clients sending a body upload it in `CLIENT_DELAY` seconds to stand
+in for a slow network: that holds a WSGI thread, but not the event loop.
+
+Rows are committed so that every thread's connection sees them, and deleted
+when the run ends. Run it against a file database, not an in-memory one.
+'''
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from api_v1.helpers.instrumentation import percentile
+from api_v1.models import Category, Notes
+
+from . import measured_settings, result
+
+CLIENTS = 100
+WSGI_THREADS = 8
+CLIENT_DELAY = 0.05
+NAME_PREFIX = 'concurrency sport'
+
+
+class SlowInput(io.BytesIO):
+
+    def read(self, *args):
+        time.sleep(CLIENT_DELAY)
+        return super().read(*args)
+
+
+def seed(rows):
+    categories = Category.objects.bulk_create(
+        [Category(name='%s %d' % (NAME_PREFIX, i)) for i in range(max(rows // 10, 1))]
+    )
+    Notes.objects.bulk_create(
+        [Notes(title='note %d' % i, body='body %d' % i, category=categories[i % len(categories)]) for i in range(rows)]
+    )
+    return categories[0]
+
+
+def scenarios(category):
+    '''
+    Returns (name, method, sync path, async path, body) for each measured request.
+    '''
+    detail = {'pk': category.pk}
+    note = json.dumps({'title': 'load test', 'body': 'body', 'category': category.pk}).encode()
+    return [
+        ('notes list', 'GET', reverse('api_v1:notes-ViewSet-list'), reverse('api_v1:async-notes-ViewSet-list'), b''),
+        ('category detail', 'GET', reverse('api_v1:cat-viewsets-detail', kwargs=detail),
+         reverse('api_v1:async-cat-viewsets-detail', kwargs=detail), b''),
+        ('notes create', 'POST', reverse('api_v1:notes-ViewSet-list'), reverse('api_v1:async-notes-ViewSet-list'), note),
+    ]
+
+
+def wsgi_request(application, method, path, body):
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': SlowInput(body) if body else io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+    try:
+        b''.join(response)
+    finally:
+        # sends request_finished, which closes the thread's connection
+        response.close()
+    return statuses[0]
+
+
+async def asgi_request(application, method, path, body):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # the client keeps the connection open until the response is sent
+            await asyncio.Event().wait()
+        received = True
+        if body:
+            await asyncio.sleep(CLIENT_DELAY)
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    statuses = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def run_wsgi(application, method, path, body):
+    '''
+    Returns the total time and the (status, latency) of every client.
+    '''
+    def client(start):
+        status = wsgi_request(application, method, path, body)
+        return status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(WSGI_THREADS) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(client, start) for i in range(CLIENTS)]
+        outcomes = [future.result() for future in futures]
+    return time.perf_counter() - start, outcomes
+
+
+async def run_asgi(application, method, path, body):
+    async def client(start):
+        status = await asgi_request(application, method, path, body)
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*[client(start) for i in range(CLIENTS)])
+    return time.perf_counter() - start, outcomes
+
+
+def summarize(name, seconds, outcomes):
+    latencies = [latency for status, latency in outcomes]
+    return result(
+        name, len(outcomes), seconds,
+        clients=CLIENTS,
+        errors=sum(1 for status, latency in outcomes if status >= 400),
+        p50_ms=round(percentile(latencies, 0.5) * 1000, 1),
+        p95_ms=round(percentile(latencies, 0.95) * 1000, 1),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 1),
+    )
+
+
+def run(rows):
+    wsgi, asgi = get_wsgi_application(), get_asgi_application()
+    results = []
+    with measured_settings():
+        category = seed(rows)
+        try:
+            for name, method, sync_path, async_path, body in scenarios(category):
+                results.append(summarize('%s wsgi' % name, *run_wsgi(wsgi, method, sync_path, body)))
+                results.append(summarize('%s asgi' % name, *asyncio.run(run_asgi(asgi, method, async_path, body))))
+        finally:
+            Category.objects.filter(name__startswith=NAME_PREFIX).delete()
+    return results
@@ -0,0 +1,106 @@
+'''
+Per-request latency of small endpoints with a new database connection per
+request, with persistent connections and with the connection pool.
+
+Requests go through the WSGI application, which sends request_finished after
+each response: without persistence that closes the connection, with it the
+connection is kept (or returned to the pool). The pool is only measured on
+Postgres. `THREADS` clients then share `POOL_SIZE` pooled connections, to
+report the pool's waits and timeouts.
+
+Rows are committed so that every thread's connection sees them, and deleted
+when the run ends.
+'''
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+
+from api_v1.helpers.instrumentation import percentile
+from api_v1.helpers.pool import pool_stats
+from api_v1.models import Category
+
+from . import measured_settings, result
+from .concurrency import wsgi_request
+
+MAX_REQUESTS = 200
+THREADS = 8
+POOL_SIZE = 4
+NAME_PREFIX = 'connections sport'
+
+
+def configure(settings_dict, mode):
+    '''
+    Switches the default database to 'per request', 'persistent' or 'pooled' connections.
+    '''
+    connection = connections['default']
+    connection.close()
+    if hasattr(connection, 'close_pool'):
+        # Postgres only
+        connection.close_pool()
+    settings_dict['CONN_MAX_AGE'] = 60 if mode == 'persistent' else 0
+    settings_dict['OPTIONS'].pop('pool', None)
+    if mode == 'pooled':
+        settings_dict['OPTIONS']['pool'] = {'min_size': POOL_SIZE, 'max_size': POOL_SIZE, 'timeout': 10}
+
+
+def timed_requests(application, paths):
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        status = wsgi_request(application, 'GET', path, b'')
+        assert status == 200, status
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def latency_result(name, latencies, seconds, **extra):
+    return result(name, len(latencies), seconds,
+                  p50_ms=round(percentile(latencies, 0.5) * 1000, 2),
+                  p95_ms=round(percentile(latencies, 0.95) * 1000, 2), **extra)
+
+
+def run(rows):
+    count = max(1, min(rows, MAX_REQUESTS))
+    application = get_wsgi_application()
+    settings_dict = connections['default'].settings_dict
+    saved = dict(settings_dict, OPTIONS=dict(settings_dict['OPTIONS']))
+    modes = ['per request', 'persistent'] + (['pooled'] if connections['default'].vendor == 'postgresql' else [])
+    results = []
+    with measured_settings():
+        user = User.objects.create_user('connectionsbenchmark', 'connections@example.com', 'password')
+        category = Category.objects.create(name='%s category' % NAME_PREFIX)
+        scenarios = [
+            ('user retrieve', reverse('api_v1:user-ViewSet-detail', kwargs={'pk': user.pk})),
+            ('category retrieve', reverse('api_v1:cat-viewsets-detail', kwargs={'pk': category.pk})),
+        ]
+        try:
+            for mode in modes:
+                configure(settings_dict, mode)
+                for name, path in scenarios:
+                    # the first request opens the connection (or the pool) in every mode
+                    timed_requests(application, [path])
+                    start = time.perf_counter()
+                    latencies = timed_requests(application, [path] * count)
+                    results.append(latency_result('%s %s' % (name, mode), latencies, time.perf_counter() - start))
+                if mode == 'pooled':
+                    name, path = scenarios[0]
+                    with ThreadPoolExecutor(THREADS) as executor:
+                        start = time.perf_counter()
+                        chunks = list(executor.map(lambda chunk: timed_requests(application, chunk),
+                                                   [[path] * (count // THREADS or 1)] * THREADS))
+                        seconds = time.perf_counter() - start
+                    stats = pool_stats('default')
+                    results.append(latency_result(
+                        '%s pooled %d threads' % (name, THREADS), [latency for chunk in chunks for latency in chunk],
+                        seconds, waits=stats['waits'], timeouts=stats['timeouts'], checkouts=stats['checkouts'],
+                    ))
+        finally:
+            configure(settings_dict, None)
+            settings_dict.update(saved)
+            User.objects.filter(pk=user.pk).delete()
+            Category.objects.filter(pk=category.pk).delete()
+    return results
@@ -0,0 +1,169 @@
+'''
+Latency, query count and peak memory of every view style in api_v1, and of
+each pagination class on the first and on a deep page.
+
+Endpoints are requested through the URL conf and the full middleware stack.
+Endpoints returning the whole table are skipped above `UNPAGINATED_MAX_ROWS`.
+'''
+import json
+import tracemalloc
+from base64 import b64encode, urlsafe_b64encode
+from urllib.parse import urlencode
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.urls import reverse
+from rest_framework.pagination import LimitOffsetPagination
+
+from api_v1.helpers.instrumentation import percentile
+from api_v1.helpers.pagination import KeysetPagination
+from api_v1.models import Category, Notes, Person
+from api_v1.views.Category import CategoryViewSet, StandardCursorPagination, StandardResultsSetPagination
+
+from . import Timer, api_client, measured_settings, request_factory, result, rolled_back
+
+REPEAT = 10
+BATCH_SIZE = 10000
+UNPAGINATED_MAX_ROWS = 10000
+PAGE_SIZE = 10
+
+# (name, url name, detail object, query parameters, paginated)
+ENDPOINTS = [
+    ('CategoryAPIView list', 'api_v1:apiviews_categories', None, {}, False),
+    ('CategoryListMixins list', 'api_v1:mixins_categories', None, {}, True),
+    ('CategoryDetailMixins retrieve', 'api_v1:mixins_categories', 'category', {}, True),
+    ('CategoryListGenericApiView list', 'api_v1:generics_categories', None, {}, True),
+    ('CategoryDetailGenericApiView retrieve', 'api_v1:generics_categories', 'category', {}, True),
+    ('CategoryView list', 'api_v1:categories-ViewSet-list', None, {}, False),
+    ('CategoryViewSet list', 'api_v1:cat-viewsets-list', None, {}, True),
+    ('CategoryViewSet retrieve', 'api_v1:cat-viewsets-detail', 'category', {}, True),
+    ('CategoryFunctionView list', 'api_v2:fn_categories', None, {}, False),
+    ('NotesViewSet list', 'api_v1:notes-ViewSet-list', None, {}, False),
+    ('NotesViewSet list keyset', 'api_v1:notes-ViewSet-list', None, {'cursor': ''}, True),
+    ('NotesViewSet search', 'api_v1:notes-ViewSet-search', None, {'q': 'body 7'}, True),
+    ('UserViewSet list', 'api_v1:user-ViewSet-list', None, {}, False),
+    ('UserViewSet retrieve', 'api_v1:user-ViewSet-detail', 'person', {}, True),
+]
+
+# (name, method, url name, detail object, payload); the update paths, for their query counts
+UPDATES = [
+    ('CategoryAPIView put', 'put', 'api_v1:apiviews_categories', 'category', {'name': 'benchmark sport renamed'}),
+    ('UserViewSet partial_update', 'patch', 'api_v1:user-ViewSet-detail', 'person', {'first_name': 'renamed'}),
+]
+
+PAGINATION_CLASSES = [
+    ('page number', StandardResultsSetPagination),
+    ('limit offset', LimitOffsetPagination),
+    ('cursor', StandardCursorPagination),
+    ('keyset', KeysetPagination),
+]
+
+
+def seed(rows):
+    '''
+    Creates `rows` categories, notes and users, in batches.
+    '''
+    password = make_password(None)
+    categories = []
+    for start in range(0, rows, BATCH_SIZE):
+        end = min(start + BATCH_SIZE, rows)
+        categories += Category.objects.bulk_create(
+            [Category(name='benchmark sport %d' % i) for i in range(start, end)]
+        )
+        Notes.objects.bulk_create(
+            [Notes(title='note %d' % i, body='body %d' % i, category=categories[i]) for i in range(start, end)]
+        )
+        Person.objects.bulk_create(
+            [Person(username='benchmark%d' % i, email='user%d@example.com' % i, password=password) for i in range(start, end)]
+        )
+    return {'category': categories[len(categories) // 2], 'person': Person.objects.order_by('pk').last()}
+
+
+class QueryCounter():
+    '''
+    Counts queries with an execute wrapper; `CaptureQueriesContext` loses the
+    queries of client requests, since request_started resets the query log.
+    '''
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(name, rows, call, expected_status=200):
+    '''
+    Times `call` REPEAT times after a warm-up, then counts its queries and its
+    peak Python memory in two more calls (tracemalloc would skew the timings).
+    '''
+    response = call()
+    assert response.status_code == expected_status, (name, response.status_code)
+    timings = []
+    for i in range(REPEAT):
+        with Timer() as timer:
+            call()
+        timings.append(timer.seconds)
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        call()
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result(
+        name, rows, percentile(timings, 0.5),
+        p50_ms=round(percentile(timings, 0.5) * 1000, 2),
+        p95_ms=round(percentile(timings, 0.95) * 1000, 2),
+        queries=queries.count,
+        peak_kib=round(peak / 1024, 1),
+    )
+
+
+def page_queries(pagination_class, rows):
+    '''
+    Query parameters of the first and of the last full page of categories.
+    '''
+    if pagination_class is StandardResultsSetPagination:
+        return [('first', {}), ('deep', {'page': max(rows // PAGE_SIZE, 1)})]
+    if pagination_class is LimitOffsetPagination:
+        return [('first', {'limit': PAGE_SIZE}), ('deep', {'limit': PAGE_SIZE, 'offset': max(rows - PAGE_SIZE, 0)})]
+    # the row just before the last page
+    position = Category.objects.order_by('created_at', 'id').values('created_at', 'id')[max(rows - PAGE_SIZE - 1, 0)]
+    if pagination_class is StandardCursorPagination:
+        cursor = b64encode(urlencode({'p': str(position['created_at'])}).encode()).decode()
+    else:
+        payload = {'p': [position['created_at'].isoformat(), position['id']]}
+        cursor = urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    return [('first', {}), ('deep', {'cursor': cursor})]
+
+
+def run(rows):
+    client = api_client()
+    factory = request_factory()
+    results = []
+    with measured_settings(), rolled_back():
+        objects = seed(rows)
+        for name, url_name, detail, query, paginated in ENDPOINTS:
+            if not paginated and rows > UNPAGINATED_MAX_ROWS:
+                continue
+            kwargs = {'pk': objects[detail].pk} if detail else {}
+            url = reverse(url_name, kwargs=kwargs)
+            results.append(measure(name, rows, lambda: client.get(url, query)))
+
+        for name, method, url_name, detail, payload in UPDATES:
+            url = reverse(url_name, kwargs={'pk': objects[detail].pk})
+            call = getattr(client, method)
+            results.append(measure(name, rows, lambda: call(url, payload, format='json'), expected_status=201))
+
+        for label, pagination_class in PAGINATION_CLASSES:
+            view = CategoryViewSet.as_view({'get': 'list'}, pagination_class=pagination_class)
+            for page, query in page_queries(pagination_class, rows):
+                results.append(measure(
+                    'CategoryViewSet %s pagination, %s page' % (label, page), rows,
+                    lambda: view(factory.get('/api_v1/cat/', query)).render()
+                ))
+    return results
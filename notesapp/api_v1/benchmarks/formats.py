@@ -0,0 +1,55 @@
+'''
+Encode time, decode time and payload size of the JSON, MessagePack and CBOR
+renderers, on a notes list and on categories with their nested notes.
+'''
+import json
+
+import cbor2
+import msgpack
+from rest_framework.renderers import JSONRenderer
+
+from api_v1.helpers.renderers import CBORRenderer, MessagePackRenderer
+from api_v1.models import Category, Notes
+from api_v1.serializers import CategoryModelSerializer, NotesModelSerializer
+
+from . import Timer, result, rolled_back
+
+# (renderer, function decoding its output)
+FORMATS = [
+    (JSONRenderer(), json.loads),
+    (MessagePackRenderer(), msgpack.unpackb),
+    (CBORRenderer(), cbor2.loads),
+]
+
+
+def seed(rows):
+    categories = Category.objects.bulk_create(
+        [Category(name='formats sport %d' % i) for i in range(max(rows // 10, 1))]
+    )
+    Notes.objects.bulk_create(
+        [Notes(title='note %d' % i, body='body of the note %d ' % i * 4, category=categories[i % len(categories)])
+         for i in range(rows)]
+    )
+
+
+def run(rows):
+    results = []
+    with rolled_back():
+        seed(rows)
+        payloads = [
+            ('notes', Notes.objects.count(), NotesModelSerializer(Notes.objects.all(), many=True).data),
+            ('categories with notes', Category.objects.count(),
+             CategoryModelSerializer(Category.objects.prefetch_related('notes'), many=True).data),
+        ]
+        for name, count, data in payloads:
+            json_bytes = None
+            for renderer, decode in FORMATS:
+                with Timer() as timer:
+                    body = renderer.render(data)
+                with Timer() as decoding:
+                    decode(body)
+                json_bytes = json_bytes or len(body)
+                results.append(result('%s %s' % (name, renderer.format), count, timer.seconds,
+                                      bytes=len(body), size_vs_json=round(len(body) / json_bytes, 3),
+                                      decode_seconds=round(decoding.seconds, 4)))
+    return results
@@ -0,0 +1,78 @@
+'''
+Hashes per second of every configured password hasher: one at a time, and
+across `PASSWORD_HASH_WORKERS` threads and processes, also reported per core.
+Then creating users one request at a time against the `users/bulk/` endpoint.
+
+Password hashing is slow by design, so at most `MAX_HASHES` passwords are
+hashed per measurement whatever `--rows` is.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers, make_password
+
+from api_v1.helpers.passwords import hash_passwords, setup_worker
+from api_v1.views.User import UserViewSet
+
+from . import Timer, request_factory, result, rolled_back
+
+MAX_HASHES = 32
+
+
+def available_hashers():
+    for hasher in get_hashers():
+        if hasher.library is not None:
+            try:
+                hasher._load_library()
+            except ValueError:
+                # e.g. argon2-cffi is not installed
+                continue
+        yield hasher
+
+
+def hash_result(name, count, seconds, cores):
+    return result(name, count, seconds, cores=cores, hashes_per_core=round(count / seconds / cores, 1))
+
+
+def user_payloads(count):
+    return [{'username': 'hashbenchmark%d' % i, 'email': 'hash%d@example.com' % i, 'first_name': 'first',
+             'last_name': 'last', 'password': 'password %d' % i} for i in range(count)]
+
+
+def run(rows):
+    count = max(1, min(rows, MAX_HASHES))
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count()
+    cores = min(workers, os.cpu_count())
+    passwords = ['password %d' % i for i in range(count)]
+    results = []
+
+    for hasher in available_hashers():
+        with Timer() as timer:
+            for password in passwords:
+                make_password(password, hasher=hasher.algorithm)
+        results.append(hash_result('%s hash serial' % hasher.algorithm, count, timer.seconds, 1))
+        pools = [('threads', ThreadPoolExecutor(workers)), ('processes', ProcessPoolExecutor(workers, initializer=setup_worker))]
+        for label, executor in pools:
+            with executor:
+                # starts the workers outside the timing
+                hash_passwords(passwords[:2], hasher.algorithm, executor)
+                with Timer() as timer:
+                    hash_passwords(passwords, hasher.algorithm, executor)
+            results.append(hash_result('%s hash %d %s' % (hasher.algorithm, workers, label), count, timer.seconds, cores))
+
+    factory = request_factory()
+    create = UserViewSet.as_view({'post': 'create'}, throttle_classes=[])
+    bulk = UserViewSet.as_view({'post': 'bulk'}, throttle_classes=[], permission_classes=[])
+    with rolled_back():
+        with Timer() as timer:
+            for payload in user_payloads(count):
+                response = create(factory.post('/api_v1/users/', payload, format='json'))
+                assert response.status_code == 201, response.data
+        results.append(result('users single-item create', count, timer.seconds))
+    with rolled_back():
+        with Timer() as timer:
+            response = bulk(factory.post('/api_v1/users/bulk/', user_payloads(count), format='json'))
+            assert response.status_code == 201, response.data
+        results.append(result('users bulk create', count, timer.seconds))
+    return results
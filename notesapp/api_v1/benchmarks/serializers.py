@@ -0,0 +1,43 @@
+'''
+Compares the compiled fast read path with the DRF serializers it replaces.
+'''
+from django.contrib.auth.hashers import make_password
+from rest_framework.renderers import JSONRenderer
+
+from api_v1.helpers.fast_read import get_compiled
+from api_v1.models import Category, Notes, Person
+from api_v1.serializers import CategorySerializer, NotesModelSerializer, PersonModelSerializer
+
+from . import Timer, result, rolled_back
+
+
+def seed(rows):
+    categories = Category.objects.bulk_create(
+        [Category(name='benchmark sport %d' % i) for i in range(rows)]
+    )
+    Notes.objects.bulk_create(
+        [Notes(title='note %d' % i, body='body %d' % i, category=categories[i % len(categories)]) for i in range(rows)]
+    )
+    password = make_password(None)
+    Person.objects.bulk_create(
+        [Person(username='benchmark%d' % i, email='user%d@example.com' % i, password=password) for i in range(rows)]
+    )
+
+
+def run(rows):
+    renderer = JSONRenderer()
+    results = []
+    with rolled_back():
+        seed(rows)
+        for serializer_class in (CategorySerializer, NotesModelSerializer, PersonModelSerializer):
+            queryset = serializer_class.Meta.model.objects.all()
+            with Timer() as timer:
+                drf = renderer.render(serializer_class(queryset, many=True).data)
+            results.append(result('%s serializer' % serializer_class.__name__, queryset.count(), timer.seconds))
+
+            compiled = get_compiled(serializer_class)
+            with Timer() as timer:
+                fast = renderer.render(compiled.serialize(compiled.values(queryset)))
+            results.append(result('%s compiled' % serializer_class.__name__, queryset.count(), timer.seconds,
+                                  identical=fast == drf))
+    return results
@@ -0,0 +1,106 @@
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+
+from .validators import find_unique_conflicts
+
+
+class AsyncViewSetMixin():
+    '''
+    Runs a ViewSet's actions as coroutines, so under ASGI a request waiting on
+    the database or a slow client does not hold a worker thread.
+
+    Actions must be `async def` and use the async ORM (`aget`, `acreate`,
+    `async for`). Throttles with an `aallow_request` coroutine (the counter
+    throttles) are awaited; only authentication, which reads the session or
+    user table through the sync ORM, runs in a thread.
+    Include it before `ViewSet` in the bases.
+    '''
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        # keeps cls, initkwargs, actions and csrf_exempt for the router and schema
+        update_wrapper(async_view, view)
+        return async_view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        '''
+        Async counterpart of `APIView.initial`.
+        '''
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await sync_to_async(self.perform_authentication)(request)
+        self.check_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def acheck_throttles(self, request):
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [duration for duration in throttle_durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    async def aget_object_or_404(self, queryset, **lookup):
+        try:
+            return await queryset.aget(**lookup)
+        except (ObjectDoesNotExist, ValueError, TypeError):
+            raise NotFound()
+
+    async def acreate_from(self, serializer):
+        '''
+        Validates a serializer in a thread (validators query the database) and
+        inserts its data with `acreate`, reporting unique conflicts the same
+        way `UniqueIntegrityMixin` does.
+        '''
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        model = serializer.Meta.model
+        try:
+            serializer.instance = await model.objects.acreate(**serializer.validated_data)
+        except IntegrityError:
+            conflicts = await sync_to_async(find_unique_conflicts)(serializer, [serializer.validated_data], [None])
+            if not conflicts:
+                raise
+            raise serializers.ValidationError(conflicts[0])
+        return serializer.instance
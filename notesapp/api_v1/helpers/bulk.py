@@ -0,0 +1,222 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.settings import api_settings
+
+from .instrumentation import TimedDataMixin
+from .validators import find_unique_conflicts
+
+# Sent inside the transaction of a bulk write, which sends no post_save, with
+# `instances`, `created` and, for updates, `previous`: the column values each
+# item's updated fields had before (see `api_v1.signals`).
+bulk_saved = Signal()
+
+
+def item_errors(errors, length):
+    '''
+    Lays out {index: errors} the way `ListSerializer` reports its own errors.
+    '''
+    if getattr(api_settings, 'LIST_SERIALIZER_ERRORS_AS_DICT', False):
+        return errors
+    return [errors.get(index, {}) for index in range(length)]
+
+
+class BulkListSerializer(TimedDataMixin, serializers.ListSerializer):
+    '''
+    List serializer that writes a whole payload with `bulk_create`/`bulk_update`.
+
+    To use it, point a model serializer at it:
+    class Meta:
+        list_serializer_class = BulkListSerializer
+
+    Related primary keys are resolved for the whole payload with one `in_bulk`
+    query per field instead of one `get` per item, and `BatchUniqueValidator`
+    fields are checked with one `IN` query per field. Errors are reported per
+    item, keyed by the item's position in the payload.
+    '''
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload_related_fields(data)
+            self.preload_unique_fields(data)
+            if isinstance(self.instance, list):
+                self._child_instances = iter(self.instance)
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        child_instances = getattr(self, '_child_instances', None)
+        if child_instances is not None:
+            self.child.instance = next(child_instances)
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def preload_related_fields(self, data):
+        '''
+        Replaces the per-item lookup of writable primary key fields with a dict
+        built from a single `WHERE pk IN (...)` query.
+        '''
+        for field in self.child.fields.values():
+            if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = {
+                item[field.field_name] for item in data
+                if isinstance(item, dict) and item.get(field.field_name) not in (None, '')
+            }
+            try:
+                found = field.get_queryset().in_bulk(pks)
+            except (TypeError, ValueError, DjangoValidationError):
+                continue
+            field.to_internal_value = PreloadedLookup(field, {str(pk): obj for pk, obj in found.items()})
+
+    def preload_unique_fields(self, data):
+        '''
+        Looks up every candidate value of fields validated by a `BatchUniqueValidator`.
+        '''
+        self.unique_lookups = {}
+        for field in self.child.fields.values():
+            if field.read_only:
+                continue
+            values = []
+            for item in data:
+                if isinstance(item, dict) and field.field_name in item:
+                    try:
+                        values.append(field.to_internal_value(item[field.field_name]))
+                    except serializers.ValidationError:
+                        pass
+            for validator in field.validators:
+                taken = validator.preload(field.source_attrs[-1], values) if hasattr(validator, 'preload') else None
+                if taken is not None:
+                    self.unique_lookups[field.field_name] = taken
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            instances = self.instance if isinstance(self.instance, list) else [None] * len(self.validated_data)
+            conflicts = find_unique_conflicts(self.child, self.validated_data, instances)
+            if not conflicts:
+                raise
+            raise serializers.ValidationError(item_errors(conflicts, len(instances)))
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        instances = [model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            instances = model.objects.bulk_create(instances, batch_size=self.batch_size)
+            bulk_saved.send(sender=model, instances=instances, created=True, using=model.objects.db)
+        return instances
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        fields = set()
+        previous = []
+        now = timezone.now()
+        for instance, attrs in zip(instances, validated_data):
+            # column values, so that relations are not fetched
+            previous.append({attr: getattr(instance, model._meta.get_field(attr).attname) for attr in attrs})
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+            fields.update(attrs)
+            # bulk_update does not run auto_now
+            instance.updated_at = now
+        fields.add('updated_at')
+        with transaction.atomic():
+            model.objects.bulk_update(instances, list(fields), batch_size=self.batch_size)
+            bulk_saved.send(sender=model, instances=instances, created=False, previous=previous, using=model.objects.db)
+        return instances
+
+
+class PreloadedLookup():
+    '''
+    Stands in for `PrimaryKeyRelatedField.to_internal_value` once the related
+    objects of a payload have been loaded; unknown keys go through the field.
+    '''
+
+    def __init__(self, field, objects):
+        self.field = field
+        self.objects = objects
+
+    def __call__(self, data):
+        try:
+            return self.objects[str(data)]
+        except KeyError:
+            return type(self.field).to_internal_value(self.field, data)
+
+
+class BulkSchema(AutoSchema):
+    '''
+    Gives each method of the `bulk/` action its own operationId, e.g.
+    `bulkCreateNotes` and `bulkDestroyNotes`, named after the model of the
+    view's `bulk_serializer_class`; AutoSchema names them all after the action.
+    '''
+    method_actions = {'POST': 'bulkCreate', 'PUT': 'bulkUpdate', 'PATCH': 'bulkPartialUpdate', 'DELETE': 'bulkDestroy'}
+
+    def get_operation_id(self, path, method):
+        if getattr(self.view, 'action', None) != 'bulk':
+            return super().get_operation_id(path, method)
+        action = self.method_actions[method.upper()]
+        serializer_class = getattr(self.view, 'bulk_serializer_class', None)
+        if self.operation_id_base is None and serializer_class is not None:
+            return action + serializer_class.Meta.model.__name__
+        return action + self.get_operation_id_base(path, method, action)
+
+
+class BulkModelMixin():
+    '''
+    Adds a `bulk/` route to a ViewSet accepting a list payload:
+
+    POST creates every item, PUT/PATCH update the items by their `id` and
+    DELETE removes a list of ids. Each request is validated as a whole and
+    written in one transaction; nothing is written if any item is invalid.
+    '''
+    bulk_serializer_class = None
+    schema = BulkSchema()
+
+    def get_bulk_queryset(self):
+        return self.bulk_serializer_class.Meta.model.objects.all()
+
+    @action(methods=['post', 'put', 'patch', 'delete'], detail=False, url_path='bulk', url_name='bulk')
+    def bulk(self, request, format=None):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'POST':
+            return self.bulk_create(request)
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+        return self.bulk_update(request, partial=request.method == 'PATCH')
+
+    def bulk_create(self, request):
+        serializer = self.bulk_serializer_class(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, partial=False):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in request.data]
+        found = self.get_bulk_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)])
+        missing = {
+            index: {'id': ['Not found.']} for index, pk in enumerate(ids)
+            if not isinstance(pk, int) or pk not in found
+        }
+        if missing:
+            return Response(item_errors(missing, len(ids)), status=status.HTTP_400_BAD_REQUEST)
+        instances = [found[pk] for pk in ids]
+        serializer = self.bulk_serializer_class(instances, data=request.data, many=True, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def bulk_destroy(self, request):
+        ids = [pk for pk in request.data if isinstance(pk, int)]
+        if len(ids) != len(request.data):
+            return Response({'detail': 'Expected a list of ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            self.get_bulk_queryset().filter(pk__in=ids).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,163 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .compression import precompress
+from .instrumentation import timed
+from .replicas import current_replica
+
+KEY_PREFIX = 'api_v1:response'
+CACHED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+# qualified names of the view methods using `cache_response`
+CACHED_VIEWS = set()
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def generation_key(model):
+    # proxies (Person) share the generation of the table they live in (auth.User)
+    return '%s:generation:%s' % (KEY_PREFIX, model._meta.concrete_model._meta.label_lower)
+
+
+def get_generations(models):
+    '''
+    Returns the current generation counter of each model.
+
+    A missing counter (never set, or evicted) starts from the current time in
+    milliseconds, so it can never fall back to a value an older entry was keyed with.
+    '''
+    cache = get_cache()
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate_model(model):
+    '''
+    Bumps the generation of a model so every cached response built from it is skipped.
+    '''
+    cache = get_cache()
+    key = generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def record(name, outcome):
+    cache = get_cache()
+    key = '%s:%s:%s' % (KEY_PREFIX, outcome, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_cache_stats(names=None):
+    '''
+    Returns {view name: {'hits': n, 'misses': n}} for the cached views.
+    '''
+    names = sorted(CACHED_VIEWS) if names is None else names
+    keys = {}
+    for name in names:
+        for outcome in ('hits', 'misses'):
+            keys['%s:%s:%s' % (KEY_PREFIX, outcome, name)] = (name, outcome)
+    stats = {name: {'hits': 0, 'misses': 0} for name in names}
+    for key, value in get_cache().get_many(list(keys)).items():
+        name, outcome = keys[key]
+        stats[name][outcome] = value
+    return stats
+
+
+def response_key(request, models):
+    '''
+    Builds the cache key from the API version, path, query parameters,
+    negotiated media type and the generation of every model the response reads.
+    Responses read from a replica are kept apart from those read from the primary,
+    which clients pinned to the primary must get.
+    '''
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    parts = [
+        str(request.version),
+        request.path,
+        query,
+        str(getattr(request, 'accepted_media_type', '')),
+        'replica' if current_replica.get() else 'primary',
+    ] + [str(generation) for generation in get_generations(models)]
+    digest = hashlib.md5('\n'.join(parts).encode()).hexdigest()
+    return '%s:entry:%s' % (KEY_PREFIX, digest)
+
+
+def cache_response(*models, timeout=None):
+    '''
+    Caches the rendered response of a GET view method, shared by every user.
+
+    The entry is keyed on the generation of `models`, which signal handlers bump
+    on every write (see `api_v1.signals`), so a write is visible immediately.
+    Only successful, non-streaming responses are cached; those read from a
+    replica for at most `REPLICA_PIN_SECONDS`. Each entry also holds the body
+    compressed in every coding `CompressionMiddleware` may send, so hits are
+    compressed for free. Usage:
+
+    @cache_response(Category, Notes)
+    def list(self, request, format=None):
+    '''
+    def decorator(view_method):
+        name = view_method.__qualname__
+        CACHED_VIEWS.add(name)
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+            cache = get_cache()
+            key = response_key(request, models)
+            entry = cache.get(key)
+            if entry is not None:
+                record(name, 'hits')
+                response = HttpResponse(entry['content'], status=entry['status'])
+                for header, value in entry['headers'].items():
+                    response[header] = value
+                response.precompressed = entry.get('precompressed', {})
+                response['X-Cache'] = 'HIT'
+                return response
+
+            record(name, 'misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.streaming or response.status_code != 200:
+                return response
+            # before `finalize_response`, which leaves the replica of the request
+            replica = current_replica.get()
+            response = self.finalize_response(request, response, *args, **kwargs)
+            with timed('render'):
+                response.render()
+            match = request.resolver_match
+            entry = {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+                'precompressed': precompress(response.content, match.url_name if match is not None else None),
+            }
+            response.precompressed = entry['precompressed']
+            entry_timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300) if timeout is None else timeout
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            if replica and (entry_timeout is None or entry_timeout > pin_seconds):
+                # a replica may not have replayed the latest write yet
+                entry_timeout = pin_seconds
+            cache.set(key, entry, timeout=entry_timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
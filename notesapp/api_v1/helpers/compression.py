@@ -0,0 +1,230 @@
+import gzip
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# coding: function(content, level), for the codings whose library is installed
+ENCODERS = {'gzip': lambda content, level: gzip.compress(content, compresslevel=level, mtime=0)}
+if brotli is not None:
+    ENCODERS['br'] = lambda content, level: brotli.compress(content, quality=level)
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda content, level: zstandard.ZstdCompressor(level=level).compress(content)
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+
+
+def available_codings():
+    '''
+    The codings of `RESPONSE_COMPRESSION_CODINGS` that can be produced, in order of preference.
+    '''
+    codings = getattr(settings, 'RESPONSE_COMPRESSION_CODINGS', ('br', 'zstd', 'gzip'))
+    return [coding for coding in codings if coding in ENCODERS]
+
+
+def parse_accept_encoding(header):
+    '''
+    Returns {coding: q} of an Accept-Encoding header.
+    '''
+    weights = {}
+    for item in header.split(','):
+        coding, _, parameters = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        name, _, value = parameters.strip().partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def choose_coding(accept_encoding, codings=None):
+    '''
+    The coding to send a client with this Accept-Encoding: the one it weighs
+    highest, ties going to the order of `codings`. None for no compression.
+    '''
+    weights = parse_accept_encoding(accept_encoding or '')
+    best, best_weight = None, 0.0
+    for coding in available_codings() if codings is None else codings:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def min_size():
+    return getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+
+
+class CompressionStats():
+    '''
+    Bytes before and after compression and the CPU time spent, per URL name
+    and coding, kept in process memory.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.totals = defaultdict(lambda: {'compressed': 0, 'precompressed': 0, 'bytes': 0,
+                                           'compressed_bytes': 0, 'cpu_seconds': 0.0})
+
+    def add(self, name, coding, size, compressed_size, cpu_seconds, precompressed=False):
+        with self.lock:
+            totals = self.totals[name, coding]
+            totals['precompressed' if precompressed else 'compressed'] += 1
+            totals['bytes'] += size
+            totals['compressed_bytes'] += compressed_size
+            totals['cpu_seconds'] += cpu_seconds
+
+    def report(self):
+        '''
+        Returns {url name: {coding: {...}}} with the responses compressed on the
+        way out and those served from a precompressed cache entry, the
+        compression ratio and the CPU milliseconds per compressed response.
+        '''
+        with self.lock:
+            totals = {key: dict(value) for key, value in self.totals.items()}
+        report = defaultdict(dict)
+        for (name, coding), value in sorted(totals.items()):
+            value['ratio'] = round(value['bytes'] / value['compressed_bytes'], 2) if value['compressed_bytes'] else None
+            value['cpu_ms'] = round(value.pop('cpu_seconds') * 1000 / value['compressed'], 3) if value['compressed'] else 0
+            report[name][coding] = value
+        return dict(report)
+
+
+compression_stats = CompressionStats()
+
+
+def compress(content, coding, name=None):
+    '''
+    Returns `content` compressed with `coding` at its `RESPONSE_COMPRESSION_LEVELS`
+    level, recording the cost under the URL name `name`.
+    '''
+    level = getattr(settings, 'RESPONSE_COMPRESSION_LEVELS', {}).get(coding, DEFAULT_LEVELS[coding])
+    start = time.thread_time()
+    compressed = ENCODERS[coding](content, level)
+    if name is not None:
+        compression_stats.add(name, coding, len(content), len(compressed), time.thread_time() - start)
+    return compressed
+
+
+def precompress(content, name=None):
+    '''
+    Returns {coding: compressed content} for every available coding, or {}
+    when `content` is under `RESPONSE_COMPRESSION_MIN_SIZE`. Stored with cached responses.
+    '''
+    if len(content) < min_size():
+        return {}
+    return {coding: compress(content, coding, name) for coding in available_codings()}
+
+
+async def agzip_chunks(content):
+    # each chunk of an async body as a gzip member of its own; clients decode concatenated members
+    async for chunk in content:
+        yield gzip.compress(chunk, mtime=0)
+
+
+class CompressionMiddleware():
+    '''
+    Compresses responses with the coding the client prefers among gzip, and br
+    and zstd when brotli and zstandard are installed.
+
+    Responses under `RESPONSE_COMPRESSION_MIN_SIZE` bytes are sent as they are.
+    Responses carrying `precompressed` variants (cached responses, see
+    `cache_response`) are not compressed again. Streaming responses are only
+    gzipped. Works in sync and async chains. List it right after
+    `InstrumentationMiddleware`.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress_response(request, await self.get_response(request))
+
+    def compress_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code != 200:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        match = request.resolver_match
+        name = match.url_name if match is not None else None
+
+        if response.streaming:
+            if choose_coding(accept_encoding, ['gzip']) is None:
+                return response
+            if response.is_async:
+                response.streaming_content = agzip_chunks(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response['Content-Length']
+            response['Content-Encoding'] = 'gzip'
+            return self.tag_etag(response, 'gzip')
+
+        if len(response.content) < min_size():
+            return response
+        coding = choose_coding(accept_encoding)
+        if coding is None:
+            return response
+        precompressed = getattr(response, 'precompressed', {})
+        if coding in precompressed:
+            content = precompressed[coding]
+            if name is not None:
+                compression_stats.add(name, coding, len(response.content), len(content), 0.0, precompressed=True)
+        else:
+            content = compress(response.content, coding, name)
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = coding
+        return self.tag_etag(response, coding)
+
+    @staticmethod
+    def tag_etag(response, coding):
+        # the bytes differ from the uncompressed representation's: a strong ETag
+        # stays strong with the coding appended, "<etag>-<coding>" (see `strip_coding`)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = '%s-%s"' % (etag[:-1], coding)
+        return response
+
+
+def strip_coding(etag):
+    '''
+    The ETag `CompressionMiddleware` sent for a compressed response, stripped
+    of its coding: '"123-gzip"' -> '"123"'. Other ETags are returned as they are.
+    '''
+    tag, _, coding = etag.rpartition('-')
+    if etag.startswith('"') and coding[:-1] in DEFAULT_LEVELS:
+        return tag + '"'
+    return etag
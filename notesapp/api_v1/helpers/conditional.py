@@ -0,0 +1,119 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+# never part of a representation, and keeps credentials out of ETags
+UNTRACKED_FIELDS = ('password', 'last_login')
+
+
+def queryset_state(queryset):
+    '''
+    Summarizes the rows of a queryset without loading them.
+
+    Models with `updated_at` (every `CommonFieldsMixin` model) are summarized by
+    one COUNT / MAX(updated_at) aggregate; other models (auth users) by the
+    values of their rows, which is only meant for single-row querysets.
+    Returns (state, last_modified, empty).
+    '''
+    field_names = [field.attname for field in queryset.model._meta.concrete_fields]
+    if 'updated_at' not in field_names:
+        rows = list(queryset.order_by('pk').values_list(*[
+            name for name in field_names if name not in UNTRACKED_FIELDS
+        ]))
+        return repr(rows), None, not rows
+    state = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+    return '%(count)s:%(last_modified)s' % state, state['last_modified'], not state['count']
+
+
+def get_validators(request, querysets):
+    '''
+    Returns the (etag, last_modified) of a response built from `querysets`,
+    or (None, None) when the main queryset is empty so that 404s stay 404s.
+    '''
+    parts = [str(request.version), request.get_full_path(), str(getattr(request, 'accepted_media_type', ''))]
+    last_modified = None
+    for index, queryset in enumerate(querysets):
+        state, modified, empty = queryset_state(queryset)
+        if index == 0 and empty:
+            return None, None
+        parts.append(state)
+        if modified is not None and (last_modified is None or modified > last_modified):
+            last_modified = modified
+    etag = 'W/' + quote_etag(hashlib.md5('\n'.join(parts).encode()).hexdigest())
+    if last_modified is not None:
+        if timezone.is_naive(last_modified):
+            last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+        last_modified = int(last_modified.timestamp())
+    return etag, last_modified
+
+
+def conditional_get(get_querysets):
+    '''
+    Adds ETag / Last-Modified headers to a GET view method and answers
+    If-None-Match with 304 before the payload is built.
+
+    Only a matching ETag gets a 304: Last-Modified is MAX(updated_at) in whole
+    seconds, which a delete or a second write in the same second leaves as it
+    was, so If-Modified-Since alone is always answered in full.
+
+    `get_querysets(view, request, *args, **kwargs)` returns the querysets the
+    response is built from, the main one first. Usage:
+
+    @conditional_get(lambda view, request, *args, **kwargs: [Notes.objects.all()])
+    def list(self, request, format=None):
+    '''
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+            etag, last_modified = get_validators(request, get_querysets(self, request, *args, **kwargs))
+            if etag is None:
+                return view_method(self, request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def related_querysets(view, pk):
+    '''
+    Querysets of the rows nested in a detail representation, taken from the
+    one-level `prefetch_related_fields` of the view's serializer.
+    '''
+    serializer_class = view.get_serializer_class()
+    querysets = []
+    for lookup in getattr(serializer_class, 'prefetch_related_fields', []):
+        if '__' in lookup:
+            continue
+        relation = serializer_class.Meta.model._meta.get_field(lookup)
+        querysets.append(relation.related_model.objects.filter(**{relation.field.name: pk}))
+    return querysets
+
+
+class ConditionalRetrieveMixin():
+    '''
+    Conditional GET for the `retrieve` action of generic views. The ETag covers
+    the object and the rows its serializer nests (e.g. a category's notes).
+    '''
+
+    def get_conditional_querysets(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        main = self.get_queryset().filter(**{self.lookup_field: pk})
+        return [main] + related_querysets(self, pk)
+
+    @conditional_get(lambda view, request, *args, **kwargs: view.get_conditional_querysets())
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
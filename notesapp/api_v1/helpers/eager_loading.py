@@ -0,0 +1,78 @@
+from rest_framework import serializers
+
+from .fast_read import ordering_fields
+from .sparse_fields import SparseFieldsMixin
+
+
+class EagerLoadingMixin():
+    '''
+    Lets a serializer declare the relations it reads so that the queryset
+    feeding it can load them up front instead of once per row.
+
+    To use this mixin, include it in a serializer like this:
+    class CategoryModelSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+        select_related_fields = []
+        prefetch_related_fields = ['notes']
+
+    Nested serializers that also use this mixin have their own relations
+    prefixed with the field source, e.g. `notes__category`.
+    '''
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def get_eager_loading_spec(cls, prefix=''):
+        '''
+        Returns the (select_related, prefetch_related) lookups of this serializer
+        and of every nested serializer it declares.
+        '''
+        select_related = [prefix + field for field in cls.select_related_fields]
+        prefetch_related = [prefix + field for field in cls.prefetch_related_fields]
+        for name, field in cls._declared_fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, EagerLoadingMixin):
+                continue
+            nested_prefix = '%s%s__' % (prefix, field.source or name)
+            nested_select, nested_prefetch = nested.get_eager_loading_spec(nested_prefix)
+            if isinstance(field, serializers.ListSerializer):
+                # rows reached through a to-many relation can only be prefetched
+                prefetch_related += nested_select + nested_prefetch
+            else:
+                select_related += nested_select
+                prefetch_related += nested_prefetch
+        return select_related, prefetch_related
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None, *extra_columns):
+        '''
+        Applies the declared select_related / prefetch_related lookups to a queryset.
+
+        With a GET request and a serializer using `SparseFieldsMixin`, the queryset
+        is projected to the requested fields instead, which also skips the
+        prefetch of nested serializers the client left out. `extra_columns` are
+        loaded as well, e.g. the fields a paginator orders by.
+        '''
+        if request is not None and issubclass(cls, SparseFieldsMixin):
+            projected = cls.select_fields(queryset, request, *extra_columns)
+            if projected is not queryset:
+                return projected
+        select_related, prefetch_related = cls.get_eager_loading_spec()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class EagerLoadingViewMixin():
+    '''
+    Generic view mixin that eager loads whatever the view's serializer declares.
+    It must come before `GenericAPIView` in the bases so its `get_queryset` wins.
+    '''
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, EagerLoadingMixin):
+            queryset = serializer_class.setup_eager_loading(queryset, self.request, *ordering_fields(self.paginator))
+        return queryset
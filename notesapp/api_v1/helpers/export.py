@@ -0,0 +1,231 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.db import connections
+from django.db.models import Max, Min, Q
+
+from api_v1.models import Notes
+from api_v1.serializers import NotesModelSerializer
+
+from .fast_read import get_compiled
+from .renderers import NDJSONRenderer
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+# backed by the notes_created_at_id_idx index; unique, so it can be resumed from
+ORDERING = ('created_at', 'id')
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+def checkpoint_path(path):
+    return path + '.checkpoint'
+
+
+def read_checkpoint(path):
+    try:
+        with open(checkpoint_path(path)) as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    # written aside and renamed, so an interruption never leaves half a checkpoint
+    temporary = checkpoint_path(path) + '.tmp'
+    with open(temporary, 'w') as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, checkpoint_path(path))
+
+
+def remove_export(path):
+    '''
+    Removes an export, its checkpoint and the parts of a parallel export.
+    '''
+    state = read_checkpoint(path) or {}
+    paths = [path, checkpoint_path(path)]
+    for index in range(len(state.get('parts', ()))):
+        paths += [part_path(path, index), checkpoint_path(part_path(path, index))]
+    for name in paths:
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def part_path(path, index):
+    return '%s.part%d' % (path, index)
+
+
+def notes_to_export(id_range=None, position=None):
+    '''
+    Notes in (created_at, id) order, within `id_range` ([low, high)) and after
+    `position` (a (created_at, id) pair) when given.
+    '''
+    queryset = Notes.objects.order_by(*ORDERING)
+    if id_range is not None:
+        queryset = queryset.filter(id__gte=id_range[0], id__lt=id_range[1])
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    return queryset
+
+
+def iter_export_rows(queryset, chunk_size):
+    '''
+    Yields the (created_at, id) position and the `NotesModelSerializer`
+    representation of every note. `.iterator()` reads through a server-side
+    cursor where the database has them, `chunk_size` rows at a time.
+    '''
+    compiled = get_compiled(NotesModelSerializer)
+    if compiled is not None:
+        for values in compiled.values(queryset, *ORDERING).iterator(chunk_size=chunk_size):
+            yield (values['created_at'], values['id']), compiled.row_to_dict(values)
+        return
+    serializer = NotesModelSerializer()
+    for note in queryset.iterator(chunk_size=chunk_size):
+        yield (note.created_at, note.pk), serializer.to_representation(note)
+
+
+def export_field_names():
+    compiled = get_compiled(NotesModelSerializer)
+    if compiled is not None:
+        return compiled.field_names
+    return tuple(name for name, field in NotesModelSerializer().fields.items() if not field.write_only)
+
+
+def export_part(path, export_format, chunk_size, id_range=None, header=True, progress=None):
+    '''
+    Writes the notes of `id_range` to `path`, resuming from its checkpoint.
+
+    Every chunk of rows is appended as its own gzip member, and the checkpoint
+    then records the position of its last row and the file size. Concatenated
+    gzip members read as one stream, and a resumed export first truncates the
+    file to the checkpointed size, dropping a chunk that was cut short.
+
+    Returns the final checkpoint state; `progress` is called with it after every chunk.
+    '''
+    id_range = None if id_range is None else list(id_range)
+    state = read_checkpoint(path)
+    if state is None:
+        state = {'format': export_format, 'id_range': id_range, 'position': None, 'offset': 0, 'rows': 0, 'done': False}
+    elif state.get('format') != export_format or state.get('id_range') != id_range or 'offset' not in state:
+        raise CheckpointMismatch('%s was written by a different export' % checkpoint_path(path))
+    if state['done']:
+        return state
+    if state['offset'] and (not os.path.exists(path) or os.path.getsize(path) < state['offset']):
+        raise CheckpointMismatch('%s is shorter than its checkpoint' % path)
+
+    position = None
+    if state['position'] is not None:
+        created_at, pk = state['position']
+        position = (Notes._meta.get_field('created_at').to_python(created_at), pk)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    field_names = export_field_names()
+    if writer is not None and header and state['position'] is None:
+        writer.writerow(field_names)
+
+    with open(path, 'r+b' if state['offset'] else 'wb') as output:
+        output.truncate(state['offset'])
+        output.seek(state['offset'])
+
+        def flush(pending, last_position):
+            output.write(gzip.compress(buffer.getvalue().encode('utf-8')))
+            output.flush()
+            os.fsync(output.fileno())
+            buffer.seek(0)
+            buffer.truncate()
+            if last_position is not None:
+                state['position'] = [last_position[0].isoformat(), last_position[1]]
+            state['offset'] = output.tell()
+            state['rows'] += pending
+            write_checkpoint(path, state)
+            if progress is not None:
+                progress(state)
+
+        pending = 0
+        last_position = None
+        for last_position, row in iter_export_rows(notes_to_export(id_range, position), chunk_size):
+            if writer is not None:
+                writer.writerow([row[name] for name in field_names])
+            else:
+                buffer.write(NDJSONRenderer.render_line(row))
+            pending += 1
+            if pending >= chunk_size:
+                flush(pending, last_position)
+                pending = 0
+        if pending or buffer.tell():
+            flush(pending, last_position)
+    state['done'] = True
+    write_checkpoint(path, state)
+    return state
+
+
+def split_id_range(parts):
+    '''
+    Splits the ids of the notes table into at most `parts` [low, high) ranges of equal width.
+    '''
+    bounds = Notes.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return [[0, 1]]
+    low, high = bounds['low'], bounds['high'] + 1
+    step = -(-(high - low) // parts)
+    return [[start, min(start + step, high)] for start in range(low, high, step)]
+
+
+def setup_worker():
+    # a no-op after a fork; spawned workers start without Django configured
+    django.setup()
+
+
+def export_notes(path, export_format, chunk_size, workers=1, progress=None):
+    '''
+    Exports every note to `path`, gzip-compressed. With several `workers` each
+    process exports one id range to its own part, in (created_at, id) order
+    within the part, and the parts are concatenated once they are all done.
+    The ranges are kept in the checkpoint, so a resumed export splits the same way.
+
+    Returns the number of rows written.
+    '''
+    if workers <= 1:
+        state = export_part(path, export_format, chunk_size, progress=progress)
+        os.remove(checkpoint_path(path))
+        return state['rows']
+
+    plan = read_checkpoint(path)
+    if plan is None:
+        plan = {'format': export_format, 'parts': split_id_range(workers)}
+        write_checkpoint(path, plan)
+    elif plan.get('format') != export_format or 'parts' not in plan:
+        raise CheckpointMismatch('%s was written by a different export' % checkpoint_path(path))
+
+    # forked workers must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(min(workers, len(plan['parts'])), initializer=setup_worker) as pool:
+        futures = [
+            pool.submit(export_part, part_path(path, index), export_format, chunk_size, id_range, index == 0)
+            for index, id_range in enumerate(plan['parts'])
+        ]
+        states = []
+        for future in as_completed(futures):
+            states.append(future.result())
+            if progress is not None:
+                progress(states[-1])
+
+    parts = [part_path(path, index) for index in range(len(plan['parts']))]
+    with open(path, 'wb') as output:
+        for name in parts:
+            with open(name, 'rb') as part:
+                shutil.copyfileobj(part, output)
+    for name in parts:
+        os.remove(name)
+        os.remove(checkpoint_path(name))
+    os.remove(checkpoint_path(path))
+    return sum(state['rows'] for state in states)
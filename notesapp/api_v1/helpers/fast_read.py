@@ -0,0 +1,184 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .instrumentation import timed
+from .sparse_fields import SparseFieldsMixin, has_field_selection
+
+# serializer fields whose `to_representation` returns database values unchanged
+IDENTITY_FIELDS = {
+    serializers.CharField: {'CharField', 'TextField', 'SlugField', 'EmailField', 'URLField'},
+    serializers.EmailField: {'CharField', 'EmailField'},
+    serializers.IntegerField: {'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                               'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField'},
+    serializers.BooleanField: {'BooleanField'},
+}
+
+COMPILED_SERIALIZERS = {}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class CompiledSerializer():
+    '''
+    Flat row -> dict function generated from a model serializer's readable fields.
+
+    Rows come from `.values()`, so no model instance is built and fields whose
+    representation is the database value itself are copied without a call. Every
+    other field goes through its own `to_representation`, which keeps the output
+    identical to the serializer's. Serializers with nested serializers, method
+    fields or non-column sources cannot be compiled.
+
+    `field_names` compiles a subset of the fields (a sparse fieldset).
+    '''
+
+    def __init__(self, serializer_class, field_names=None):
+        self.serializer_class = serializer_class
+        model = serializer_class.Meta.model
+        self.columns = []
+        self.field_names = []
+        namespace = {}
+        lines = []
+        items = []
+        for index, field in enumerate(serializer_class().fields.values()):
+            if field.write_only or (field_names is not None and field.field_name not in field_names):
+                continue
+            self.field_names.append(field.field_name)
+            column, converter = self.compile_field(model, field)
+            self.columns.append(column)
+            lines.append('    v%d = row[%r]' % (index, column))
+            if converter is None:
+                items.append('%r: v%d' % (field.field_name, index))
+            else:
+                namespace['c%d' % index] = converter
+                items.append('%r: None if v%d is None else c%d(v%d)' % (field.field_name, index, index, index))
+        source = 'def row_to_dict(row):\n%s\n    return {%s}\n' % ('\n'.join(lines), ', '.join(items))
+        exec(compile(source, '<compiled %s>' % serializer_class.__name__, 'exec'), namespace)
+        self.row_to_dict = namespace['row_to_dict']
+        self.field_names = tuple(self.field_names)
+
+    @staticmethod
+    def compile_field(model, field):
+        '''
+        Returns the `.values()` column a field reads and the converter to apply,
+        None when the column value is already the representation.
+        '''
+        if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField,
+                              serializers.SerializerMethodField)) or len(field.source_attrs) != 1:
+            raise NotCompilable('%s cannot be read from a single column' % field.field_name)
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise NotCompilable('%s is not a model field' % field.field_name)
+        if model_field.is_relation:
+            if model_field.many_to_one and type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+                return model_field.attname, None
+            raise NotCompilable('%s is not a primary key relation' % field.field_name)
+        if model_field.get_internal_type() in IDENTITY_FIELDS.get(type(field), ()):
+            return model_field.attname, None
+        return model_field.attname, field.to_representation
+
+    def values(self, queryset, *extra):
+        '''
+        Narrows a queryset to the columns the compiled function reads, plus `extra`
+        (e.g. the ordering fields a paginator needs).
+        '''
+        return queryset.values(*dict.fromkeys(self.columns + list(extra)))
+
+    def serialize(self, rows):
+        row_to_dict = self.row_to_dict
+        with timed('serializer'):
+            return [row_to_dict(row) for row in rows]
+
+
+def compile_serializers(*serializer_classes):
+    '''
+    Opts serializers into the fast read path; called once from `ApiV1Config.ready`.
+    '''
+    for serializer_class in serializer_classes:
+        COMPILED_SERIALIZERS[serializer_class] = CompiledSerializer(serializer_class)
+
+
+def get_compiled(serializer_class, request=None):
+    '''
+    Returns the compiled form of a serializer, narrowed to the fields the request
+    selects with `?fields=` / `?omit=`, or None when it was not compiled.
+    '''
+    compiled = COMPILED_SERIALIZERS.get(serializer_class)
+    if compiled is None or request is None or not issubclass(serializer_class, SparseFieldsMixin) \
+            or not has_field_selection(request):
+        return compiled
+    fields = serializer_class(context={'request': request}).fields
+    field_names = tuple(name for name, field in fields.items() if not field.write_only)
+    if field_names == compiled.field_names:
+        return compiled
+    key = (serializer_class, field_names)
+    if key not in COMPILED_SERIALIZERS:
+        COMPILED_SERIALIZERS[key] = CompiledSerializer(serializer_class, field_names)
+    return COMPILED_SERIALIZERS[key]
+
+
+def ordering_fields(paginator):
+    '''
+    Fields a paginator reads from each row to build its links.
+    '''
+    ordering = getattr(paginator, 'ordering', None) or ()
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return [field.lstrip('-') for field in ordering]
+
+
+def fast_serialize(serializer_class, queryset, request=None, view=None, paginator=None):
+    '''
+    Serializes a queryset, or the page `paginator` picks from it, through the
+    compiled serializer when there is one and through `serializer_class` otherwise.
+    '''
+    compiled = get_compiled(serializer_class, request)
+    if compiled is not None:
+        queryset = compiled.values(queryset, *ordering_fields(paginator))
+    elif issubclass(serializer_class, SparseFieldsMixin):
+        queryset = serializer_class.select_fields(queryset, request, *ordering_fields(paginator))
+    rows = None if paginator is None else paginator.paginate_queryset(queryset, request, view=view)
+    if rows is None:
+        rows = queryset
+    if compiled is not None:
+        return compiled.serialize(rows)
+    return serializer_class(rows, many=True, context={'request': request, 'view': view}).data
+
+
+async def afast_serialize(serializer_class, queryset, request=None, view=None, paginator=None):
+    '''
+    `fast_serialize` for async views. The rows are fetched with the async ORM, so
+    a serializer that is not compiled must not query for its representation.
+    '''
+    compiled = get_compiled(serializer_class, request)
+    if compiled is not None:
+        queryset = compiled.values(queryset, *ordering_fields(paginator))
+    if paginator is not None:
+        rows = await paginator.apaginate_queryset(queryset, request, view=view)
+    else:
+        rows = [row async for row in queryset]
+    if compiled is not None:
+        return compiled.serialize(rows)
+    return serializer_class(rows, many=True, context={'request': request, 'view': view}).data
+
+
+class FastListMixin():
+    '''
+    Serves `list` from `.values()` through the compiled serializer when the view's
+    serializer has been compiled, and from the serializer itself otherwise.
+    Include it before `ListModelMixin` (or the generic view) in the bases.
+    '''
+
+    def list(self, request, *args, **kwargs):
+        compiled = get_compiled(self.get_serializer_class(), request)
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = compiled.values(queryset, *ordering_fields(self.paginator))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(queryset))
@@ -0,0 +1,219 @@
+import csv
+import gzip
+import io
+import json
+
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from api_v1.models import Category, Notes
+from api_v1.serializers import CategorySerializer, NotesModelSerializer
+
+from .bulk import bulk_saved
+from .export import EXPORT_FORMATS
+
+IMPORT_FORMATS = EXPORT_FORMATS
+# written by COPY; search_vector is left to the database trigger
+COPY_COLUMNS = ('title', 'body', 'category_id', 'created_at', 'updated_at')
+
+
+def open_input(path):
+    '''
+    Opens a JSONL or CSV file for reading as text, decompressing `.gz` files.
+    '''
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'jsonl'
+
+
+def read_rows(stream, import_format):
+    '''
+    Yields (line number, row) for every record of the stream; the row is a dict,
+    or None when the line could not be parsed.
+    '''
+    if import_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class CategoryLookup():
+    '''
+    Resolves the `category` of an imported row, a primary key or a name, from
+    tables of every existing category loaded once.
+
+    With `create=True` unknown names are created through `CategorySerializer`,
+    so they pass the same validations as the API; rejected names are remembered.
+    '''
+
+    def __init__(self, create=False, using='default'):
+        self.create = create
+        self.using = using
+        categories = Category.objects.using(using)
+        self.ids = set(categories.values_list('pk', flat=True))
+        self.names = dict(categories.values_list('name', 'pk'))
+        self.rejected = {}
+
+    def resolve(self, value):
+        '''
+        Returns (category id, None) or (None, errors).
+        '''
+        if value in (None, ''):
+            return None, {'category': ['This field is required.']}
+        name = str(value).strip()
+        if name.isdigit():
+            if int(name) in self.ids:
+                return int(name), None
+            return None, {'category': ['Invalid pk "%s" - object does not exist.' % name]}
+        if name in self.names:
+            return self.names[name], None
+        if not self.create:
+            return None, {'category': ['Unknown category "%s".' % name]}
+        if name not in self.rejected:
+            serializer = CategorySerializer(data={'name': name})
+            if serializer.is_valid():
+                category = serializer.save()
+                self.ids.add(category.pk)
+                self.names[name] = category.pk
+                return category.pk, None
+            self.rejected[name] = {'category': [str(error) for errors in serializer.errors.values() for error in errors]}
+        return None, self.rejected[name]
+
+
+class NoteRowValidator():
+    '''
+    Runs the field validation of `NotesModelSerializer`, and its `validate`,
+    on plain rows. Categories are resolved by a `CategoryLookup` instead of the
+    serializer's one query per row.
+    '''
+
+    def __init__(self, categories):
+        self.categories = categories
+        self.serializer = NotesModelSerializer()
+        self.fields = [
+            field for name, field in self.serializer.fields.items()
+            if not field.read_only and name != 'category'
+        ]
+
+    def validate(self, row):
+        '''
+        Returns (attrs, None) or (None, errors) in the serializer's error format.
+        '''
+        attrs = {}
+        errors = {}
+        for field in self.fields:
+            try:
+                attrs[field.source] = field.run_validation(row.get(field.field_name, empty))
+            except serializers.ValidationError as error:
+                errors[field.field_name] = error.detail
+        category_id, category_errors = self.categories.resolve(row.get('category'))
+        if category_errors:
+            errors.update(category_errors)
+        if errors:
+            return None, errors
+        try:
+            attrs = self.serializer.validate(attrs)
+        except serializers.ValidationError as error:
+            return None, serializers.as_serializer_error(error)
+        attrs['category_id'] = category_id
+        return attrs, None
+
+
+class NotesLoader():
+    '''
+    Writes batches of validated notes: with COPY on Postgres, with `bulk_create` elsewhere.
+    '''
+
+    def __init__(self, using='default', batch_size=10000):
+        self.using = using
+        self.batch_size = batch_size
+        self.connection = connections[using]
+
+    def uses_copy(self):
+        return self.connection.vendor == 'postgresql'
+
+    def load(self, instances):
+        if not self.uses_copy():
+            Notes.objects.using(self.using).bulk_create(instances, batch_size=self.batch_size)
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for note in instances:
+            writer.writerow([note.title, note.body, note.category_id, note.created_at.isoformat(),
+                             note.updated_at.isoformat()])
+        buffer.seek(0)
+        quote = self.connection.ops.quote_name
+        sql = 'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+            quote(Notes._meta.db_table), ', '.join(quote(column) for column in COPY_COLUMNS)
+        )
+        with self.connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+
+def import_notes(rows, rejected, batch_size=10000, create_categories=False, using='default', progress=None):
+    '''
+    Validates and loads (line number, row) pairs, as yielded by `read_rows`.
+
+    Each batch of `batch_size` valid rows is written in its own transaction,
+    which also sends `bulk_saved` so category counts and cached responses
+    follow. Rejected rows are written to the `rejected` text file as JSON lines
+    with their line number, the row and the errors. Only one batch is held in
+    memory at a time.
+
+    Returns {'imported': n, 'rejected': n}; `progress` is called with it after every batch.
+    '''
+    validator = NoteRowValidator(CategoryLookup(create_categories, using))
+    loader = NotesLoader(using, batch_size)
+    counts = {'imported': 0, 'rejected': 0}
+    batch = []
+
+    def flush():
+        now = timezone.now()
+        for note in batch:
+            # COPY bypasses auto_now_add and auto_now
+            note.created_at = note.updated_at = now
+        with transaction.atomic(using=using):
+            loader.load(batch)
+            bulk_saved.send(sender=Notes, instances=batch, created=True, using=using)
+        counts['imported'] += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(counts)
+
+    for number, row in rows:
+        if row is None:
+            attrs, errors = None, {'non_field_errors': ['Not a JSON object.']}
+        else:
+            attrs, errors = validator.validate(row)
+        if errors:
+            rejected.write(json.dumps({'line': number, 'row': row, 'errors': errors}, ensure_ascii=False) + '\n')
+            counts['rejected'] += 1
+            continue
+        batch.append(Notes(**attrs))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return counts
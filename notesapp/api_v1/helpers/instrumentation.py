@@ -0,0 +1,221 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework import serializers
+
+PHASES = ('db', 'serializer', 'render', 'throttle')
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+# timings of the request being instrumented; None when it was not sampled
+current_timings = ContextVar('api_v1_request_timings', default=None)
+
+
+class RequestTimings():
+    '''
+    Query count and time spent per phase for one request.
+
+    Phases can overlap: serializer time includes the queries a lazy queryset
+    runs while being serialized.
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+    def sample(self, total):
+        '''
+        Returns the request as a flat dict of milliseconds (and the query count).
+        '''
+        sample = {'total': total * 1000, 'queries': self.queries}
+        for phase, seconds in self.durations.items():
+            sample[phase] = seconds * 1000
+        return sample
+
+    def server_timing(self, total):
+        metrics = ['db;dur=%.2f;desc="%d queries"' % (self.durations['db'] * 1000, self.queries)]
+        metrics += ['%s;dur=%.2f' % (phase, self.durations[phase] * 1000) for phase in PHASES[1:]]
+        metrics.append('total;dur=%.2f' % (total * 1000))
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timed(phase):
+    '''
+    Adds the time spent in the block to `phase` of the current request, if it is sampled.
+    '''
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def time_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute_wrapper(execute, sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    '''
+    Charges every query of a connection to the sampled request it runs for, if
+    any; connected to `connection_created` from `ApiV1Config.ready`. Concurrent
+    requests sharing a connection's thread each count only their own queries.
+    '''
+    if time_query not in connection.execute_wrappers:
+        # outermost, so that the wrappers of `connection.execute_wrapper()` blocks pop their own
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class TimedDataMixin():
+    '''
+    Adds the time spent in `.data` to the serializer phase of a sampled request.
+    Nested serializers are called through `to_representation`, so they are not
+    counted twice.
+    '''
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RequestStats():
+    '''
+    The most recent samples of each URL name, kept in process memory.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(deque)
+
+    def add(self, name, sample):
+        size = getattr(settings, 'INSTRUMENTATION_SAMPLES_PER_VIEW', 1000)
+        with self.lock:
+            samples = self.samples[name]
+            samples.append(sample)
+            while len(samples) > size:
+                samples.popleft()
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def report(self):
+        '''
+        Returns {url name: {'samples': n, metric: {'p50': .., 'p95': .., 'p99': ..}}}.
+        '''
+        with self.lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        report = {}
+        for name, values in sorted(samples.items()):
+            report[name] = {'samples': len(values)}
+            for metric in ('total', 'queries') + PHASES:
+                column = [value[metric] for value in values]
+                report[name][metric] = {
+                    label: round(percentile(column, fraction), 2) for label, fraction in PERCENTILES
+                }
+        return report
+
+
+request_stats = RequestStats()
+
+
+class InstrumentationMiddleware():
+    '''
+    Records the query count and the db, serializer, render and throttle time of
+    a sample of requests, returns them in a `Server-Timing` header and
+    aggregates them per URL name in `request_stats`.
+
+    `INSTRUMENTATION_SAMPLE_RATE` is the fraction of requests instrumented; the
+    others only pay for one random number. Works in sync and async chains. List
+    it first in `MIDDLEWARE`.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    @staticmethod
+    def sampled():
+        rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        return rate and random.random() < rate
+
+    @staticmethod
+    def finish(request, response, timings):
+        total = time.perf_counter() - timings.start
+        response['Server-Timing'] = timings.server_timing(total)
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            request_stats.add(match.url_name, timings.sample(total))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, and after this hook
+        timings = current_timings.get()
+        if timings is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda response: timings.add('render', time.perf_counter() - start))
+        return response
@@ -0,0 +1,275 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    '''
+    Returns the planner's row estimate for a queryset instead of running COUNT(*).
+
+    On Postgres an unfiltered table is estimated from `pg_class.reltuples` and a
+    filtered one from the EXPLAIN row estimate. Other databases, and tables that
+    have never been analyzed, fall back to an exact count.
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return queryset.count()
+    estimate = row[0]
+    if isinstance(estimate, str):
+        estimate = json.loads(estimate)
+    if isinstance(estimate, list):
+        estimate = estimate[0]['Plan']['Plan Rows']
+    if estimate < 0:
+        return queryset.count()
+    return int(estimate)
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Seek pagination over a unique, indexed ordering.
+
+    Pages are selected with `WHERE (created_at, id) > (last seen values)` instead of
+    OFFSET, so every page costs the same index range scan however deep it is. The
+    ordering must be unique and backed by a composite index (see `Category.Meta`).
+
+    `count_mode` controls the `count` key: 'none' skips it, 'estimate' uses the
+    planner estimate and 'exact' runs COUNT(*). Clients may override it with `?count=`.
+    An empty `?cursor=` asks for the first page.
+    '''
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('none', 'estimate', 'exact')
+    count_mode = 'none'
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def requested(cls, request):
+        '''
+        Whether a request opted into keyset pages by sending a cursor, empty for the first page.
+        '''
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.get_count(queryset, request)
+        page = self.seek(queryset, request)
+        return self.finish_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''
+        Same as `paginate_queryset` for async views, using the async ORM.
+        '''
+        mode = self.get_count_mode(request)
+        if mode == 'exact':
+            self.count = await queryset.acount()
+        elif mode == 'estimate':
+            self.count = await sync_to_async(estimate_count)(queryset)
+        else:
+            self.count = None
+        page = self.seek(queryset, request)
+        return self.finish_page([row async for row in page])
+
+    def seek(self, queryset, request):
+        '''
+        Returns the query for the requested page, plus one row to detect the next page.
+        '''
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+        forward = self.descending == self.reverse
+        if self.position is not None:
+            queryset = queryset.filter(self.seek_filter(self.position, forward))
+        order = [field if forward else '-' + field for field in self.fields]
+        return queryset.order_by(*order)[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.has_next = has_more if not self.reverse else self.position is not None
+        self.has_previous = self.position is not None if not self.reverse else has_more
+        self.first_position = self.get_position(rows[0]) if rows else None
+        self.last_position = self.get_position(rows[-1]) if rows else None
+        return rows
+
+    def seek_filter(self, position, greater):
+        '''
+        Builds `(f1, f2, ...) > (v1, v2, ...)` as OR'ed equality prefixes, which
+        every database can answer from the composite index.
+        '''
+        lookup = 'gt' if greater else 'lt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            prefix = {name: position[j] for j, name in enumerate(self.fields[:i])}
+            prefix['%s__%s' % (field, lookup)] = position[i]
+            condition |= Q(**prefix)
+        return condition
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            return [instance[field] for field in self.fields]
+        return [getattr(instance, field) for field in self.fields]
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, self.count_mode)
+        return mode if mode in self.count_modes else self.count_mode
+
+    def get_count(self, queryset, request):
+        mode = self.get_count_mode(request)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, request, model):
+        '''
+        Returns the (position, reverse) encoded in the cursor query parameter.
+        '''
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(payload['p']) != len(self.fields):
+                raise ValueError
+            position = [self.parse_position_value(model, field, value) for field, value in zip(self.fields, payload['p'])]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def parse_position_value(model, field, value):
+        try:
+            return model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            # annotations (e.g. a search rank) are stored in the cursor as plain JSON values
+            return value
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            # the first page, still in keyset form for views where it is opt-in
+            return replace_query_param(self.base_url, self.cursor_query_param, '')
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('links', OrderedDict([
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+            ])),
+            ('count', self.count),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'links': {
+                    'type': 'object',
+                    'properties': {
+                        'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                        'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                    },
+                },
+                'count': {'type': 'integer', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'How to compute the total count: none, estimate or exact.',
+                'schema': {'type': 'string', 'enum': list(self.count_modes)},
+            },
+        ]
+
+
+class KeysetOptInMixin():
+    '''
+    Keeps the `pagination_class` of a generic view for existing clients and pages
+    with `keyset_pagination_class` the requests that opt in with `?cursor=`
+    (see `KeysetPagination.requested`). A `pagination_class` reading the
+    cursor itself is always kept.
+    '''
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        keyset = self.keyset_pagination_class
+        if (not hasattr(self, '_paginator') and keyset.requested(self.request)
+                and getattr(self.pagination_class, 'cursor_query_param', None) != keyset.cursor_query_param):
+            self._paginator = keyset()
+        return super().paginator
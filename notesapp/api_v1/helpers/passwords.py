@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .bulk import BulkListSerializer
+
+EXECUTORS = {}
+EXECUTORS_LOCK = threading.Lock()
+
+
+class TunableHasherMixin():
+    '''
+    Takes the cost parameters of a hasher from `PASSWORD_HASHER_PARAMETERS[algorithm]`,
+    e.g. {'scrypt': {'work_factor': 2 ** 15}}. The algorithm name and the hash
+    format stay Django's, so raising a parameter makes `must_update` true for
+    the existing hashes: they are rehashed on the next successful login.
+    '''
+
+    def __init__(self):
+        parameters = getattr(settings, 'PASSWORD_HASHER_PARAMETERS', {}).get(self.algorithm, {})
+        for name, value in parameters.items():
+            setattr(self, name, value)
+
+
+class PBKDF2PasswordHasher(TunableHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
+
+
+class ScryptPasswordHasher(TunableHasherMixin, hashers.ScryptPasswordHasher):
+    pass
+
+
+class Argon2PasswordHasher(TunableHasherMixin, hashers.Argon2PasswordHasher):
+    # needs argon2-cffi
+    pass
+
+
+@receiver(setting_changed)
+def reset_hashers(setting, **kwargs):
+    # Django only rebuilds its hasher instances when PASSWORD_HASHERS changes
+    if setting == 'PASSWORD_HASHER_PARAMETERS':
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
+
+
+def setup_worker():
+    # a no-op after a fork; spawned workers start without Django configured
+    django.setup()
+
+
+def get_hash_executor():
+    '''
+    Returns the pool `hash_passwords` runs on, created once per process.
+
+    `PASSWORD_HASH_EXECUTOR` is 'thread' (the default) or 'process', with
+    `PASSWORD_HASH_WORKERS` workers (default: one per CPU). Threads hash in
+    parallel too: PBKDF2, scrypt and argon2 all release the GIL while hashing.
+    '''
+    kind = getattr(settings, 'PASSWORD_HASH_EXECUTOR', 'thread')
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count()
+    with EXECUTORS_LOCK:
+        if (kind, workers) not in EXECUTORS:
+            if kind == 'process':
+                executor = ProcessPoolExecutor(workers, initializer=setup_worker)
+            else:
+                executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hash')
+            EXECUTORS[kind, workers] = executor
+        return EXECUTORS[kind, workers]
+
+
+def hash_passwords(passwords, hasher='default', executor=None):
+    '''
+    `make_password` of every password, in order, hashed in parallel.
+    '''
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        return [hashers.make_password(password, hasher=hasher) for password in passwords]
+    executor = executor or get_hash_executor()
+    return list(executor.map(hashers.make_password, passwords, repeat(None), repeat(hasher)))
+
+
+class BulkPasswordListSerializer(BulkListSerializer):
+    '''
+    `BulkListSerializer` for user serializers: the raw passwords of a payload
+    are hashed in parallel with `hash_passwords` before the rows are written
+    with one `bulk_create`. Only creates; updates go through the item serializer.
+    '''
+    password_field = 'password'
+    # what a new user takes from a payload, as in the item serializer's `create`:
+    # flags such as `is_superuser` and `is_active` keep their defaults
+    create_fields = ('email', 'username', 'first_name', 'last_name')
+
+    def create(self, validated_data):
+        passwords = hash_passwords(attrs.get(self.password_field) for attrs in validated_data)
+        validated_data = [
+            dict({name: attrs[name] for name in self.create_fields if name in attrs}, **{self.password_field: password})
+            for attrs, password in zip(validated_data, passwords)
+        ]
+        return super().create(validated_data)
@@ -0,0 +1,58 @@
+from django.db import connections
+
+# names of the reported metrics, from the counters of psycopg_pool's `get_stats()`
+POOL_METRICS = {
+    'checkouts': 'requests_num',
+    'waits': 'requests_queued',
+    'wait_ms': 'requests_wait_ms',
+    'timeouts': 'requests_errors',
+    'size': 'pool_size',
+    'available': 'pool_available',
+    'waiting': 'requests_waiting',
+    'connections_opened': 'connections_num',
+    'connections_lost': 'connections_lost',
+    'bad_returns': 'returns_bad',
+}
+
+
+def connection_pool(alias):
+    '''
+    The psycopg pool of a database, None unless `OPTIONS['pool']` is set on Postgres.
+    '''
+    connection = connections[alias]
+    if connection.vendor != 'postgresql' or not connection.settings_dict['OPTIONS'].get('pool'):
+        return None
+    return connection.pool
+
+
+def pool_stats(alias):
+    '''
+    Returns the metrics of a database's pool, counted since it was opened, or None
+    when it has no pool. `waits` counts the checkouts that found no idle
+    connection, `timeouts` those that gave up after the pool's `timeout`.
+    '''
+    pool = connection_pool(alias)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    metrics = {name: stats.get(counter, 0) for name, counter in POOL_METRICS.items()}
+    metrics.update(min_size=pool.min_size, max_size=pool.max_size, timeout=pool.timeout)
+    return metrics
+
+
+def all_pool_stats():
+    '''
+    Returns {alias: pool metrics or None} for every configured database.
+    '''
+    return {alias: pool_stats(alias) for alias in connections}
+
+
+def open_pools(wait=False):
+    '''
+    Opens the pool of every pooled database, so its first connections are made
+    before the first request instead of during it.
+    '''
+    for alias in connections:
+        pool = connection_pool(alias)
+        if pool is not None:
+            pool.open(wait=wait)
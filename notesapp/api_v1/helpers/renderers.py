@@ -0,0 +1,110 @@
+import json
+
+import cbor2
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+# converts what the binary encoders do not know (lazy strings, Decimal, UUID, ...) like the JSON renderer does
+JSON_ENCODER = encoders.JSONEncoder()
+
+
+class NDJSONRenderer(JSONRenderer):
+    '''
+    Renders a list as newline delimited JSON, one object per line.
+
+    Paginated responses render their `results`, anything else is rendered
+    as a single line. Selected with the `.ndjson` format suffix.
+    '''
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = data['results']
+        if not isinstance(data, list):
+            data = [data]
+        return ''.join(self.render_line(item) for item in data).encode()
+
+    @staticmethod
+    def render_line(item):
+        return json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''
+    Renders MessagePack, with the same values as the JSON renderer. Selected
+    with `Accept: application/msgpack` or the `.msgpack` format suffix.
+
+    `render_item` encodes one row of a streamed list: a streamed body is a
+    sequence of MessagePack objects, read with `msgpack.Unpacker`.
+    '''
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.render_item(data)
+
+    @staticmethod
+    def render_item(item):
+        return msgpack.packb(item, default=JSON_ENCODER.default, use_bin_type=True)
+
+
+class CBORRenderer(BaseRenderer):
+    '''
+    Renders CBOR (RFC 8949), with the same values as the JSON renderer. Selected
+    with `Accept: application/cbor` or the `.cbor` format suffix.
+
+    A streamed list is a CBOR sequence (RFC 8742), one item per row.
+    '''
+    media_type = 'application/cbor'
+    stream_media_type = 'application/cbor-seq'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.render_item(data)
+
+    @staticmethod
+    def render_item(item):
+        return cbor2.dumps(item, default=lambda encoder, value: encoder.encode(JSON_ENCODER.default(value)))
+
+
+class BinaryParser(BaseParser):
+    '''
+    Parses a request body with the `decode` function of a subclass,
+    reporting `errors` as a 400 like `JSONParser`.
+    '''
+    name = None
+    errors = ()
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return self.decode(stream.read())
+        except self.errors as error:
+            raise ParseError('%s parse error - %s' % (self.name, error))
+
+
+class MessagePackParser(BinaryParser):
+    media_type = 'application/msgpack'
+    name = 'MessagePack'
+    errors = (ValueError, msgpack.UnpackException)
+    decode = staticmethod(msgpack.unpackb)
+
+
+class CBORParser(BinaryParser):
+    media_type = 'application/cbor'
+    name = 'CBOR'
+    errors = (ValueError, cbor2.CBORDecodeError)
+    decode = staticmethod(cbor2.loads)
@@ -0,0 +1,191 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# set by `ReplicaReadMixin` for the requests it sends to a replica
+current_replica = ContextVar('api_v1_current_replica', default=None)
+
+# holds the time until which a client that wrote reads from the primary
+PIN_COOKIE = 'primary_until'
+
+
+class ReplicaRouter():
+    '''
+    Sends reads to the replica chosen for the current request, if any, and
+    every write to the primary (`default`). Listed in `DATABASE_ROUTERS`.
+    '''
+
+    def db_for_read(self, model, **hints):
+        return current_replica.get()
+
+    def db_for_write(self, model, **hints):
+        # also for instances read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def replica_lag(alias):
+    '''
+    Seconds the replica's replay is behind, 0 outside Postgres, None when it cannot be reached.
+    '''
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)')
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        return None
+
+
+class ReplicaSelector():
+    '''
+    Picks the replica of a read among `DATABASE_REPLICAS`.
+
+    `REPLICA_SELECTION` is 'round_robin' or 'least_lag'. Lags are measured at
+    most every `REPLICA_LAG_CHECK_INTERVAL` seconds per replica; with
+    `REPLICA_MAX_LAG` set, or in least-lag mode, replicas further behind or
+    unreachable are skipped. Returns None (the primary) when none is left.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns = {}
+        self.lags = {}
+
+    def lag(self, alias):
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 1.0)
+        with self.lock:
+            measured = self.lags.get(alias)
+        if measured is not None and time.monotonic() - measured[0] < interval:
+            return measured[1]
+        lag = replica_lag(alias)
+        with self.lock:
+            self.lags[alias] = (time.monotonic(), lag)
+        return lag
+
+    def choose(self):
+        replicas = tuple(getattr(settings, 'DATABASE_REPLICAS', ()))
+        if not replicas:
+            return None
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', None)
+        if getattr(settings, 'REPLICA_SELECTION', 'round_robin') == 'least_lag':
+            lags = [(lag, alias) for alias in replicas for lag in [self.lag(alias)] if lag is not None]
+            lag, alias = min(lags, default=(None, None))
+            return alias if lag is not None and (max_lag is None or lag <= max_lag) else None
+        with self.lock:
+            if replicas not in self.turns:
+                self.turns[replicas] = itertools.count()
+            start = next(self.turns[replicas]) % len(replicas)
+        # the next replica in turn, then the others if it lags too much
+        for alias in replicas[start:] + replicas[:start]:
+            if max_lag is None:
+                return alias
+            lag = self.lag(alias)
+            if lag is not None and lag <= max_lag:
+                return alias
+        return None
+
+
+replica_selector = ReplicaSelector()
+
+
+def is_pinned(request):
+    '''
+    Whether the client wrote within the last `REPLICA_PIN_SECONDS` and must read its writes.
+    '''
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class PrimaryPinningMiddleware():
+    '''
+    Pins a client to the primary for `REPLICA_PIN_SECONDS` after each successful
+    write request, with a cookie, so that its next reads see its writes even
+    while the replicas catch up. Works in sync and async chains.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    @staticmethod
+    def pin(request, response):
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and seconds:
+            response.set_cookie(PIN_COOKIE, '%.3f' % (time.time() + seconds), max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def read_from(alias, content):
+    '''
+    Iterates a streamed body with its reads sent to `alias`: the body is only
+    consumed once the view has returned and left its replica.
+    '''
+    token = current_replica.set(alias)
+    try:
+        yield from content
+    finally:
+        current_replica.reset(token)
+
+
+class ReplicaReadMixin():
+    '''
+    Opts a view into replica reads: its `replica_actions` (a generic view's
+    GET when it has no actions) read from a replica, unless the client is
+    pinned to the primary. Streamed lists (see `StreamingListMixin`) read
+    from the same replica while their body is consumed. Include it first in the bases.
+    '''
+    replica_actions = ('list', 'retrieve')
+
+    def uses_replica(self, request):
+        if request.method not in SAFE_METHODS or is_pinned(request):
+            return False
+        action = getattr(self, 'action', None)
+        return action is None or action in self.replica_actions
+
+    def initial(self, request, *args, **kwargs):
+        if self.uses_replica(request):
+            self.replica_token = current_replica.set(replica_selector.choose())
+        super().initial(request, *args, **kwargs)
+
+    def streaming_response(self, request, queryset, serializer_class):
+        response = super().streaming_response(request, queryset, serializer_class)
+        alias = current_replica.get()
+        if alias is not None:
+            response.streaming_content = read_from(alias, response.streaming_content)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            current_replica.reset(token)
+            self.replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
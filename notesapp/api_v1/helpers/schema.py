@@ -0,0 +1,154 @@
+import hashlib
+import threading
+
+import rest_framework
+import yaml
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import serializers
+from rest_framework.renderers import JSONOpenAPIRenderer, OpenAPIRenderer
+from rest_framework.schemas.generators import EndpointEnumerator
+from rest_framework.views import APIView
+
+# extension of the schema's info object holding the fingerprint it was generated from
+FINGERPRINT_KEY = 'x-fingerprint'
+# field attributes AutoSchema reads; repr() of a serializer is not used, it can query the database
+FIELD_ATTRIBUTES = ('read_only', 'write_only', 'required', 'allow_null', 'allow_blank', 'max_length', 'min_length',
+                    'max_value', 'min_value', 'help_text', 'label', 'format')
+# the libyaml loader parses the artifact about ten times faster, when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def describe_field(field):
+    '''
+    A stable text description of a serializer field, or of a serializer and its fields.
+    '''
+    attributes = ['%s=%r' % (name, str(value) if name in ('help_text', 'label') else value)
+                  for name in FIELD_ATTRIBUTES for value in [getattr(field, name, None)] if value is not None]
+    if isinstance(field, serializers.ChoiceField):
+        # related fields have choices too, read from their queryset
+        attributes.append('choices=%r' % field.choices)
+    description = '%s(%s)' % (type(field).__name__, ', '.join(attributes))
+    child = getattr(field, 'child', None) or getattr(field, 'child_relation', None)
+    if child is not None:
+        description += '[%s]' % describe_field(child)
+    if isinstance(field, serializers.Serializer):
+        description += '{%s}' % ', '.join('%s: %s' % (name, describe_field(nested)) for name, nested in field.fields.items())
+    return description
+
+
+class SchemaCache():
+    '''
+    The OpenAPI schema of `generator`, built once per process and rendered once
+    per format, with an ETag per rendering.
+
+    The schema is loaded from `artifact` (the committed schema.yml) when the
+    fingerprint stored in it matches the current one, and generated otherwise.
+    The fingerprint hashes what the schema is generated from: every endpoint's
+    path, method, view and docstring, and the fields of its serializer.
+    '''
+
+    def __init__(self, generator, artifact=None):
+        self.generator = generator
+        self.artifact = artifact
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.schema = None
+        self.source = None
+        self.rendered = {}
+
+    def fingerprint(self):
+        generator = self.generator
+        parts = [rest_framework.VERSION, generator.title or '', generator.description or '', generator.version or '']
+        endpoints = EndpointEnumerator(generator.patterns, generator.urlconf).get_api_endpoints()
+        for path, method, callback in endpoints:
+            view = generator.create_view(callback, method)
+            handler = getattr(view, getattr(view, 'action', None) or method.lower(), None)
+            parts += [path, method, '%s.%s' % (view.__module__, type(view).__qualname__),
+                      view.__doc__ or '', getattr(handler, '__doc__', None) or '',
+                      repr(getattr(view, 'pagination_class', None)), repr(getattr(view, 'filter_backends', None))]
+            if hasattr(view, 'get_serializer'):
+                try:
+                    serializer = view.get_serializer()
+                except Exception:
+                    # AutoSchema skips the serializer in the same case
+                    continue
+                parts.append(describe_field(serializer))
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def generate(self, fingerprint=None):
+        schema = self.generator.get_schema(request=None, public=True)
+        schema['info'][FINGERPRINT_KEY] = fingerprint or self.fingerprint()
+        return schema
+
+    def read_artifact(self):
+        if self.artifact is None:
+            return None
+        try:
+            with open(self.artifact, encoding='utf-8') as artifact:
+                return yaml.load(artifact, Loader=YAML_LOADER)
+        except FileNotFoundError:
+            return None
+
+    def write_artifact(self, schema):
+        with open(self.artifact, 'wb') as artifact:
+            artifact.write(OpenAPIRenderer().render(schema))
+
+    def get_schema(self):
+        with self.lock:
+            if self.schema is None:
+                fingerprint = self.fingerprint()
+                artifact = self.read_artifact()
+                if artifact and artifact.get('info', {}).get(FINGERPRINT_KEY) == fingerprint:
+                    self.schema, self.source = artifact, 'artifact'
+                else:
+                    self.schema, self.source = self.generate(fingerprint), 'generated'
+            return self.schema
+
+    def render(self, renderer):
+        '''
+        Returns the (body, etag) of the schema rendered by `renderer`.
+        '''
+        schema = self.get_schema()
+        with self.lock:
+            if renderer.format not in self.rendered:
+                body = renderer.render(schema, renderer_context={})
+                self.rendered[renderer.format] = body, quote_etag(hashlib.md5(body).hexdigest())
+            return self.rendered[renderer.format]
+
+
+class CachedSchemaView(APIView):
+    '''
+    Serves the schema of a `SchemaCache`, as YAML or (?format=openapi-json) JSON,
+    and answers If-None-Match with 304. Usage:
+
+    CachedSchemaView.as_view(schema_cache=SchemaCache(SchemaGenerator(...), artifact='schema.yml'))
+    '''
+    renderer_classes = [OpenAPIRenderer, JSONOpenAPIRenderer]
+    schema = None
+    schema_cache = None
+
+    def get(self, request, *args, **kwargs):
+        body, etag = self.schema_cache.render(request.accepted_renderer)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=request.accepted_renderer.media_type)
+        response['ETag'] = etag
+        return response
+
+
+def schema_caches(patterns=None):
+    '''
+    Yields the `SchemaCache` of every `CachedSchemaView` in the URLconf.
+    '''
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from schema_caches(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is not None and issubclass(view_class, CachedSchemaView):
+                yield pattern.callback.view_initkwargs['schema_cache']
@@ -0,0 +1,42 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .pagination import KeysetPagination
+
+# the text search configuration of the `search_vector` trigger (migration 0003)
+SEARCH_CONFIG = 'english'
+# weight of a match in each column for the fallback ranking; mirrors the A/B weights of the vector
+FALLBACK_WEIGHTS = (('title', 1.0), ('body', 0.4))
+
+
+def search_notes(queryset, terms):
+    '''
+    Filters notes to those matching `terms` and annotates them with a `rank`.
+
+    On Postgres this is a websearch query against the GIN-indexed `search_vector`,
+    ranked with `ts_rank`. Other databases (SQLite in development) fall back to
+    requiring every word in the title or body, ranked by where the words appear.
+    '''
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        # ts_rank is a float4, which psycopg reads as rounded text: as a double the
+        # rank in a page's cursor equals the stored one, so ties at the page boundary are kept
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(rank=rank)
+
+    condition = Q()
+    rank = Value(0.0)
+    for word in terms.split():
+        condition &= Q(title__icontains=word) | Q(body__icontains=word)
+        for field, weight in FALLBACK_WEIGHTS:
+            rank = rank + Case(When(**{'%s__icontains' % field: word}, then=Value(weight)), default=Value(0.0))
+    return queryset.filter(condition).annotate(rank=rank)
+
+
+class SearchPagination(KeysetPagination):
+    '''
+    Keyset pagination over search hits, best match first; `id` breaks ties.
+    '''
+    ordering = ('-rank', '-id')
@@ -0,0 +1,141 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def parse_field_paths(value):
+    '''
+    Turns 'name,notes.title' (or a list of such paths) into the tree
+    {'name': {}, 'notes': {'title': {}}}; an empty subtree means the whole field.
+    '''
+    if isinstance(value, str):
+        value = value.split(',')
+    tree = {}
+    for path in value:
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def has_field_selection(request):
+    params = getattr(request, 'query_params', request.GET)
+    return request.method in SAFE_METHODS and (FIELDS_QUERY_PARAM in params or OMIT_QUERY_PARAM in params)
+
+
+class SparseFieldsMixin():
+    '''
+    Lets clients pick the fields of a response with `?fields=name,notes.title`
+    or drop some with `?omit=notes.body`; dotted paths reach into nested
+    serializers that also use this mixin. Unknown names are ignored.
+
+    The selection is read from the request of GET/HEAD requests only, so writes
+    always validate every field. It can also be given explicitly:
+    CategoryModelSerializer(categories, many=True, fields='name', omit='')
+
+    `select_fields` pushes the same selection down into the queryset.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        omit = kwargs.pop('omit', None)
+        self.selected_fields = None if fields is None else parse_field_paths(fields)
+        self.omitted_fields = None if omit is None else parse_field_paths(omit)
+        super().__init__(*args, **kwargs)
+
+    def reads_request_selection(self):
+        root = self.root
+        return root is self or (isinstance(root, serializers.ListSerializer) and root.child is self)
+
+    def get_field_selection(self):
+        '''
+        Returns (selected, omitted) trees; `selected` is None when every field is wanted.
+        '''
+        if self.selected_fields is not None or self.omitted_fields is not None:
+            return self.selected_fields, self.omitted_fields or {}
+        request = self.context.get('request')
+        if request is None or not self.reads_request_selection() or not has_field_selection(request):
+            return None, {}
+        params = getattr(request, 'query_params', request.GET)
+        selected = params.get(FIELDS_QUERY_PARAM)
+        return (parse_field_paths(selected) if selected else None), parse_field_paths(params.get(OMIT_QUERY_PARAM, ''))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, omitted = self.get_field_selection()
+        if selected is None and not omitted:
+            return fields
+        for name in list(fields):
+            if (selected is not None and name not in selected) or omitted.get(name) == {}:
+                del fields[name]
+                continue
+            nested = fields[name].child if isinstance(fields[name], serializers.ListSerializer) else fields[name]
+            if isinstance(nested, SparseFieldsMixin):
+                nested.selected_fields = (selected or {}).get(name) or None
+                nested.omitted_fields = omitted.get(name, {})
+        return fields
+
+    @classmethod
+    def select_fields(cls, queryset, request, *extra_columns):
+        '''
+        Restricts a queryset to what the serializer will read for this request,
+        plus `extra_columns` (e.g. the fields a paginator orders by). Writes get
+        the queryset unchanged: a partially loaded instance would not save its
+        deferred fields, such as `updated_at`.
+        '''
+        if request is None or request.method not in SAFE_METHODS:
+            return queryset
+        projected = project_queryset(cls(context={'request': request}), queryset, extra_columns)
+        return queryset if projected is None else projected
+
+
+def project_queryset(serializer, queryset, extra_columns=()):
+    '''
+    Narrows a queryset with `.only()` to the columns the readable fields of
+    `serializer` use, and prefetches only the nested to-many serializers that
+    are still part of it, each projected the same way.
+
+    Returns None when a field does not map to a model field (a method field or
+    a property), since the columns it needs are then unknown.
+    '''
+    model = queryset.model
+    columns = [model._meta.pk.attname] + list(extra_columns)
+    select_related = []
+    prefetches = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if model_field.one_to_many or model_field.many_to_many:
+            lookup = field.source
+            if isinstance(nested, serializers.BaseSerializer):
+                related = model_field.related_model._default_manager.all()
+                # the foreign key back to this model is needed to attach the prefetched rows
+                back = [model_field.field.attname] if model_field.one_to_many else []
+                projected = project_queryset(nested, related, back)
+                lookup = Prefetch(field.source, queryset=related if projected is None else projected)
+            prefetches.append(lookup)
+        elif model_field.is_relation and isinstance(nested, serializers.BaseSerializer):
+            columns.append(model_field.name)
+            select_related.append(field.source)
+        elif model_field.concrete:
+            columns.append(model_field.attname)
+        else:
+            return None
+    queryset = queryset.only(*dict.fromkeys(columns))
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
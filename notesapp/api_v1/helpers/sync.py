@@ -0,0 +1,106 @@
+import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from api_v1.models import Tombstone
+
+TOKEN_SALT = 'api_v1.sync'
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync token is older than the kept tombstones; sync again without `since`.'
+    default_code = 'sync_token_expired'
+
+
+def encode_token(cursors):
+    return signing.dumps(cursors, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    '''
+    Returns the {stream: [timestamp, id]} cursors of a token issued by `sync`.
+    '''
+    try:
+        cursors = signing.loads(token, salt=TOKEN_SALT)
+        return {name: (datetime.datetime.fromisoformat(moment), int(pk)) for name, (moment, pk) in cursors.items()}
+    except (signing.BadSignature, ValueError, TypeError, AttributeError):
+        raise ValidationError({'since': ['Invalid sync token.']})
+
+
+def after(field, cursor):
+    '''
+    Rows past a (timestamp, id) cursor in (`field`, id) order.
+    '''
+    moment, pk = cursor
+    return Q(**{'%s__gt' % field: moment}) | Q(**{field: moment, 'pk__gt': pk})
+
+
+class SyncStream():
+    '''
+    The changes of one model: rows created or updated since a cursor on
+    (updated_at, id), and the ids of the rows deleted since a cursor on the
+    (deleted_at, id) of their tombstones.
+    '''
+
+    def __init__(self, name, model, serializer_class):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+
+    def changed(self, cursor, horizon, limit):
+        queryset = self.model.objects.filter(updated_at__lt=horizon)
+        if cursor is not None:
+            queryset = queryset.filter(after('updated_at', cursor))
+        return list(queryset.order_by('updated_at', 'pk')[:limit])
+
+    def deleted(self, cursor, horizon, limit):
+        return list(Tombstone.objects.of(self.model).filter(deleted_at__lt=horizon)
+                    .filter(after('deleted_at', cursor)).order_by('deleted_at', 'pk')[:limit])
+
+
+def sync(streams, token=None, limit=500, context=None):
+    '''
+    Returns the changes of every stream since `token`, at most `limit` rows
+    and `limit` deletions per stream, with the token of the next sync and
+    whether more changes are waiting.
+
+    Only rows written more than `SYNC_SETTLE_SECONDS` ago are returned, so that
+    a transaction still in flight when a token is issued cannot commit rows
+    behind it. Without a token every row is returned and deletions are
+    reported from then on. Tokens whose deletion cursors are more than
+    `SYNC_TOMBSTONE_DAYS` old are refused: the tombstones they need may have
+    been pruned. The change cursors may be older, paging through old rows.
+    '''
+    now = timezone.now()
+    horizon = now - datetime.timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 1))
+    cursors = decode_token(token) if token else {}
+    deletions = [moment for name, (moment, pk) in cursors.items() if name.endswith('.deleted')]
+    if deletions:
+        expiry = now - datetime.timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+        if min(deletions) < expiry:
+            raise SyncTokenExpired()
+
+    data = {}
+    more = False
+    next_cursors = {}
+    for stream in streams:
+        changed_key, deleted_key = '%s.changed' % stream.name, '%s.deleted' % stream.name
+        changed = stream.changed(cursors.get(changed_key), horizon, limit)
+        deleted = stream.deleted(cursors.get(deleted_key, (horizon, 0)), horizon, limit)
+        more = more or len(changed) == limit or len(deleted) == limit
+        data[stream.name] = {
+            'changed': stream.serializer_class(changed, many=True, context=context or {}).data,
+            'deleted': [tombstone.object_id for tombstone in deleted],
+        }
+        # a stream that returned everything up to the horizon resumes from there
+        next_cursors[changed_key] = (changed[-1].updated_at, changed[-1].pk) if len(changed) == limit else (horizon, 0)
+        next_cursors[deleted_key] = (deleted[-1].deleted_at, deleted[-1].pk) if len(deleted) == limit else (horizon, 0)
+    data['since'] = encode_token({name: [moment.isoformat(), pk] for name, (moment, pk) in next_cursors.items()})
+    data['has_more'] = more
+    return data
@@ -1,5 +1,194 @@
-from rest_framework.throttling import UserRateThrottle
+import threading
+import time
+from functools import lru_cache
 
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
-class UserThrottlePerMinute(UserRateThrottle):
+from .instrumentation import timed
+
+
+class CacheThrottleStore():
+    '''
+    Keeps throttle counters in a Django cache with `add` + `incr`, which are
+    atomic on Redis and memcached, so every worker sharing the cache sees the
+    same counts. Set `THROTTLE_CACHE_ALIAS` to a shared cache in production.
+    '''
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def incr(self, key, timeout):
+        while True:
+            if self.cache.add(key, 1, timeout):
+                return 1
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # the counter expired between add() and incr()
+                continue
+
+    def decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+    async def aincr(self, key, timeout):
+        while True:
+            if await self.cache.aadd(key, 1, timeout):
+                return 1
+            try:
+                return await self.cache.aincr(key)
+            except ValueError:
+                continue
+
+    async def adecr(self, key):
+        try:
+            await self.cache.adecr(key)
+        except ValueError:
+            pass
+
+    async def aget(self, key):
+        return await self.cache.aget(key, 0)
+
+
+class LocalThrottleStore():
+    '''
+    In-process counters behind a lock; a stand-in for tests and single-process servers.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def incr(self, key, timeout):
+        now = time.time()
+        with self.lock:
+            count, expires = self.counters.get(key, (0, 0))
+            if expires <= now:
+                count = 0
+                expires = now + timeout
+            self.counters[key] = (count + 1, expires)
+            return count + 1
+
+    def decr(self, key):
+        with self.lock:
+            count, expires = self.counters.get(key, (0, 0))
+            if count:
+                self.counters[key] = (count - 1, expires)
+
+    def get(self, key):
+        with self.lock:
+            count, expires = self.counters.get(key, (0, 0))
+            return count if expires > time.time() else 0
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+    # nothing here blocks on I/O, so the async API simply calls the sync one
+    async def aincr(self, key, timeout):
+        return self.incr(key, timeout)
+
+    async def adecr(self, key):
+        self.decr(key)
+
+    async def aget(self, key):
+        return self.get(key)
+
+
+@lru_cache(maxsize=None)
+def load_store(path):
+    return import_string(path)()
+
+
+def get_store():
+    return load_store(getattr(settings, 'THROTTLE_STORE', 'api_v1.helpers.throttles.CacheThrottleStore'))
+
+
+class CounterThrottleMixin():
+    '''
+    Replaces the timestamp history of `SimpleRateThrottle` with one counter per
+    time window, so each check is a single atomic increment.
+
+    'fixed' counts requests in the current window. 'sliding' also weighs the
+    previous window by how much of it still overlaps the last `duration`
+    seconds, which smooths out bursts at window boundaries.
+    '''
+    algorithm = 'fixed'
+
+    def start_window(self, request, view):
+        '''
+        Sets the keys of the current and previous windows; returns False when
+        the request is not throttled at all.
+        '''
+        if self.rate is None:
+            return False
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return False
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        self.window_key = '%s:%d' % (self.key, window)
+        self.previous_key = '%s:%d' % (self.key, window - 1)
+        self.overlap = 1 - (self.now - window * self.duration) / self.duration
+        return True
+
+    def allow_request(self, request, view):
+        with timed('throttle'):
+            return self.check_window(request, view)
+
+    def check_window(self, request, view):
+        if not self.start_window(request, view):
+            return True
+        store = get_store()
+        count = store.incr(self.window_key, self.duration * 2)
+        if self.algorithm == 'sliding':
+            count += store.get(self.previous_key) * self.overlap
+        if count > self.num_requests:
+            # refused requests do not use up the allowance, as in SimpleRateThrottle
+            store.decr(self.window_key)
+            return self.throttle_failure()
+        return True
+
+    async def aallow_request(self, request, view):
+        '''
+        Same check as `allow_request` for async views, through the store's async API.
+        '''
+        with timed('throttle'):
+            return await self.acheck_window(request, view)
+
+    async def acheck_window(self, request, view):
+        if not self.start_window(request, view):
+            return True
+        store = get_store()
+        count = await store.aincr(self.window_key, self.duration * 2)
+        if self.algorithm == 'sliding':
+            count += await store.aget(self.previous_key) * self.overlap
+        if count > self.num_requests:
+            await store.adecr(self.window_key)
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        return max(self.window_end - self.now, 0)
+
+
+class AnonCounterRateThrottle(CounterThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class UserCounterRateThrottle(CounterThrottleMixin, UserRateThrottle):
+    pass
+
+
+class UserThrottlePerMinute(UserCounterRateThrottle):
     rate = '20/minute'
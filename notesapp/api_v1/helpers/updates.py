@@ -0,0 +1,152 @@
+import datetime
+import sqlite3
+
+from django.db import connections, router, transaction
+from django.db.models import sql
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .bulk import bulk_saved
+from .compression import strip_coding
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource changed since the version in If-Match.'
+    default_code = 'precondition_failed'
+
+
+def has_version(model):
+    return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+
+def version_etag(instance):
+    '''
+    The strong ETag of a row's version, its `updated_at` in microseconds.
+    '''
+    if getattr(instance, 'updated_at', None) is None:
+        return None
+    updated_at = instance.updated_at
+    if timezone.is_naive(updated_at):
+        updated_at = timezone.make_aware(updated_at, datetime.timezone.utc)
+    return '"%d"' % ((updated_at - EPOCH) // datetime.timedelta(microseconds=1))
+
+
+def requested_versions(request):
+    '''
+    The `updated_at` values an If-Match header accepts: None without the header
+    (or with `*`, which any existing row matches), else a list that unknown
+    ETags leave empty. The ETags of compressed responses name their version
+    too; weak ETags never match and are refused.
+    '''
+    header = request.META.get('HTTP_IF_MATCH')
+    if not header:
+        return None
+    versions = []
+    for etag in parse_etags(header):
+        if etag == '*':
+            return None
+        if etag.startswith('W/'):
+            raise PreconditionFailed('If-Match needs the strong ETag of a version, weak ETags never match.')
+        try:
+            versions.append(EPOCH + datetime.timedelta(microseconds=int(strip_coding(etag).strip('"'))))
+        except ValueError:
+            continue
+    return versions
+
+
+def supports_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35)
+
+
+def update_returning(model, pk, values, versions=None, using='default'):
+    '''
+    Writes `values` to the row `pk` with one UPDATE ... RETURNING, also bumping
+    `updated_at`, and returns the updated instance without reading it again.
+    With `versions`, only a row whose `updated_at` is one of them is updated.
+
+    Raises NotFound when there is no such row and PreconditionFailed when it
+    exists at another version; telling them apart costs a query only then.
+    Backends without UPDATE ... RETURNING read the row back after the update.
+    '''
+    queryset = model._base_manager.using(using).filter(pk=pk)
+    matching = queryset
+    if versions is not None and has_version(model):
+        matching = queryset.filter(updated_at__in=versions)
+    values = dict(values)
+    if has_version(model):
+        # QuerySet.update() does not run auto_now
+        values['updated_at'] = timezone.now()
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if versions is not None and has_version(model) and not versions:
+            # no ETag of If-Match is a version
+            instance = None
+        elif supports_returning(connection):
+            query = matching.query.chain(sql.UpdateQuery)
+            query.add_update_values(values)
+            statement, params = query.get_compiler(using).as_sql()
+            columns = ', '.join(connection.ops.quote_name(field.column) for field in model._meta.concrete_fields)
+            rows = list(model._base_manager.db_manager(using).raw('%s RETURNING %s' % (statement, columns), params))
+            instance = rows[0] if rows else None
+        else:
+            instance = queryset.get() if matching.update(**values) else None
+        if instance is not None:
+            # cached responses and dependent counts follow the write, as for bulk updates
+            bulk_saved.send(sender=model, instances=[instance], created=False, using=using)
+    if instance is None:
+        if versions is not None and queryset.exists():
+            raise PreconditionFailed()
+        raise NotFound()
+    return instance
+
+
+def save_changed(instance, values):
+    '''
+    Sets `values` on a loaded instance and saves only the fields whose value
+    changed (and `updated_at`); saves nothing when none did. Returns their names.
+    '''
+    changed = [name for name, value in values.items() if getattr(instance, name) != value]
+    for name in changed:
+        setattr(instance, name, values[name])
+    if changed:
+        instance.save(update_fields=changed + (['updated_at'] if has_version(type(instance)) else []))
+    return changed
+
+
+class InPlaceUpdateMixin():
+    '''
+    Serializer `update` writing only `update_fields` (every submitted field
+    when None). A loaded instance saves the fields that changed. An instance
+    that is only a primary key, `Model(pk=pk)`, is updated with a single
+    UPDATE ... RETURNING and never read; its view passes the If-Match
+    versions, from `requested_versions`, in the context as `versions`.
+    Include it before `serializers.ModelSerializer` in the bases.
+    '''
+    update_fields = None
+
+    def update(self, instance, validated_data):
+        values = {
+            name: value for name, value in validated_data.items()
+            if self.update_fields is None or name in self.update_fields
+        }
+        if not instance._state.adding:
+            save_changed(instance, values)
+            return instance
+        model = type(instance)
+        using = router.db_for_write(model, instance=instance)
+        versions = self.context.get('versions')
+        if not values:
+            found = model._base_manager.using(using).filter(pk=instance.pk).first()
+            if found is None:
+                raise NotFound()
+            if versions is not None and has_version(model) and found.updated_at not in versions:
+                raise PreconditionFailed()
+            return found
+        return update_returning(model, instance.pk, values, versions, using=using)
@@ -1,11 +1,110 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from api_v1.models import Category
 
 
+class BatchUniqueValidator(UniqueValidator):
+    '''
+    `UniqueValidator` that can check a whole list payload with one query.
+
+    When the serializer is used with `many=True` and a `BulkListSerializer`, the
+    candidate values of every item are looked up up front with a single
+    `WHERE field IN (...)` and each item is checked against that result, which
+    also catches duplicates inside the payload. On its own it behaves exactly
+    like `UniqueValidator`.
+
+    In optimistic mode (`optimistic=True`, or the `OPTIMISTIC_UNIQUE_VALIDATION`
+    setting) the pre-check is skipped and `UniqueIntegrityMixin` turns the
+    database's IntegrityError into the same validation error instead.
+    '''
+
+    def __init__(self, queryset, message=None, lookup='exact', optimistic=None):
+        super().__init__(queryset, message=message, lookup=lookup)
+        self.optimistic = optimistic
+
+    def is_optimistic(self):
+        if self.optimistic is None:
+            return getattr(settings, 'OPTIMISTIC_UNIQUE_VALIDATION', False)
+        return self.optimistic
+
+    def existing_values(self, field_name, values, queryset=None):
+        '''
+        Returns {value: pk} for the rows already holding one of `values`.
+        '''
+        queryset = self.queryset if queryset is None else queryset
+        rows = queryset.filter(**{'%s__in' % field_name: set(values)}).values_list(field_name, 'pk')
+        return dict(rows)
+
+    def preload(self, field_name, values):
+        '''
+        Returns the lookup used to validate a list payload, or None when the
+        values should be checked one by one.
+        '''
+        if self.is_optimistic() or self.lookup != 'exact':
+            return None
+        return self.existing_values(field_name, values)
+
+    def __call__(self, value, serializer_field):
+        if self.is_optimistic():
+            return
+        taken = getattr(serializer_field.root, 'unique_lookups', {}).get(serializer_field.field_name)
+        if taken is None:
+            return super().__call__(value, serializer_field)
+        instance = getattr(serializer_field.parent, 'instance', None)
+        owner = instance.pk if instance is not None else None
+        if value in taken and taken[value] != owner:
+            raise serializers.ValidationError(self.message, code='unique')
+        # later items of the same payload may not reuse this value
+        taken[value] = owner if owner is not None else object()
+
+
+def find_unique_conflicts(serializer, items, instances):
+    '''
+    Works out which items broke a `BatchUniqueValidator` field after the database
+    rejected a write. Returns {index: {field_name: [message]}}.
+    '''
+    conflicts = {}
+    for field in serializer.fields.values():
+        for validator in field.validators:
+            if not isinstance(validator, BatchUniqueValidator):
+                continue
+            source = field.source_attrs[-1]
+            values = [item.get(source) for item in items]
+            taken = validator.existing_values(source, [value for value in values if value is not None])
+            for index, (value, instance) in enumerate(zip(values, instances)):
+                owner = instance.pk if instance is not None else None
+                if value is None:
+                    continue
+                if value in taken and taken[value] != owner:
+                    conflicts.setdefault(index, {})[field.field_name] = [validator.message]
+                taken[value] = owner if owner is not None else object()
+    return conflicts
+
+
+class UniqueIntegrityMixin():
+    '''
+    Maps an IntegrityError raised while saving onto the validation error the
+    field's `BatchUniqueValidator` would have raised, so optimistic mode
+    answers with the same 400 response as the pre-check.
+    Include it before `serializers.ModelSerializer` in the bases.
+    '''
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            conflicts = find_unique_conflicts(self, [self.validated_data], [self.instance])
+            if not conflicts:
+                raise
+            raise serializers.ValidationError(conflicts[0])
+
+
 class CategoryValidations():
     # an example of built in validation to override unique constraint validation
-    check_name_is_unique = [UniqueValidator(queryset=Category.objects.all(), message='This name already does exists!')]
+    check_name_is_unique = [BatchUniqueValidator(queryset=Category.objects.all(), message='This name already does exists!')]
 
     def validate_name(self, value):
         """
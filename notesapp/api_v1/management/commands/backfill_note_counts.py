@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api_v1.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Category.notes_count and last_note_at from the notes, in batches of categories.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Categories updated per transaction.')
+
+    def handle(self, *args, **options):
+        last_pk = 0
+        updated = 0
+        while True:
+            # walks the primary key index, so every batch costs the same
+            batch = list(
+                Category.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += Category.objects.filter(pk__in=batch).refresh_note_summary()
+            last_pk = batch[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write('%d categories updated (up to id %d)' % (updated, last_pk))
+        self.stdout.write(self.style.SUCCESS('Updated %d categories.' % updated))
@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_v1.benchmarks import bulk, compare, compression, concurrency, connections, endpoints, formats, passwords, serializers
+
+BENCHMARKS = {
+    'bulk': bulk,
+    'compression': compression,
+    'concurrency': concurrency,
+    'connections': connections,
+    'endpoints': endpoints,
+    'formats': formats,
+    'passwords': passwords,
+    'serializers': serializers,
+}
+
+
+class Command(BaseCommand):
+    help = 'Runs the api_v1 benchmarks against the configured database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run, all by default: %s.' % ', '.join(sorted(BENCHMARKS)))
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000],
+                            help='Number of rows each benchmark works with; several sizes run one after the other.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON results of an earlier run; fails when a result regressed beyond --threshold.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative growth of a metric against the baseline (default 0.2, i.e. 20%%).')
+
+    @staticmethod
+    def format_result(row):
+        line = '{name:<55} {rows:>8} rows {seconds:>10.4f}s'.format(**row)
+        if 'compressed_bytes' in row:
+            return line + ' {bytes:>10} -> {compressed_bytes:>9} bytes x{ratio:<6} {cpu_ms:>9.3f} CPU ms'.format(**row)
+        if 'size_vs_json' in row:
+            return line + ' {bytes:>10} bytes ({size_vs_json:>5.3f} of JSON) decode {decode_seconds:>8.4f}s'.format(**row)
+        if 'hashes_per_core' in row:
+            return line + ' {rows_per_second:>12} hashes/s {hashes_per_core:>10} per core'.format(**row)
+        if 'p50_ms' not in row:
+            return line + ' {rows_per_second:>12} rows/s'.format(**row)
+        line += ' p50 {p50_ms:>9.2f}ms p95 {p95_ms:>9.2f}ms'.format(**row)
+        if 'queries' in row:
+            line += ' {queries:>4} queries {peak_kib:>10.1f} KiB'.format(**row)
+        return line
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError('Unknown benchmark(s): %s' % ', '.join(sorted(unknown)))
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = []
+        for rows in options['rows']:
+            for name in options['names'] or sorted(BENCHMARKS):
+                results += BENCHMARKS[name].run(rows)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for row in results:
+                self.stdout.write(self.format_result(row))
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            for regression in regressions:
+                self.stderr.write('{name} ({rows} rows): {metric} {baseline} -> {current}'.format(**regression))
+            if regressions:
+                raise CommandError('%d regression(s) beyond the %.0f%% threshold' % (len(regressions), options['threshold'] * 100))
+            self.stdout.write('No regressions against %s' % options['compare'])
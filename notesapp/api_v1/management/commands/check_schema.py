@@ -0,0 +1,40 @@
+import difflib
+
+import yaml
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import OpenAPIRenderer
+
+from api_v1.helpers.schema import YAML_LOADER, schema_caches
+
+
+class Command(BaseCommand):
+    help = 'Fails when a committed OpenAPI schema artifact no longer matches the schema generated from the code.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--write', action='store_true', help='Regenerate the artifacts instead of checking them.')
+
+    def handle(self, *args, **options):
+        caches = {id(cache): cache for cache in schema_caches() if cache.artifact}
+        if not caches:
+            raise CommandError('No schema view with an artifact in the URLconf.')
+        drifted = []
+        for cache in caches.values():
+            generated = cache.generate()
+            if options['write']:
+                cache.write_artifact(generated)
+                self.stdout.write('Wrote %s' % cache.artifact)
+                continue
+            # compared as loaded from YAML, the way the artifact is read
+            current = OpenAPIRenderer().render(generated).decode()
+            committed = cache.read_artifact()
+            if committed == yaml.load(current, Loader=YAML_LOADER):
+                continue
+            drifted.append(cache.artifact)
+            previous = '' if committed is None else OpenAPIRenderer().render(committed).decode()
+            self.stdout.writelines(difflib.unified_diff(
+                previous.splitlines(True), current.splitlines(True), cache.artifact, 'generated'
+            ))
+        if drifted:
+            raise CommandError('%s out of date; run `manage.py check_schema --write`.' % ', '.join(drifted))
+        if not options['write']:
+            self.stdout.write(self.style.SUCCESS('Schema artifacts are up to date.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_v1.helpers.export import EXPORT_FORMATS, CheckpointMismatch, export_notes, remove_export
+
+
+class Command(BaseCommand):
+    help = ('Exports every note, in the NotesModelSerializer format, to a gzip-compressed JSONL or CSV file. '
+            'An interrupted export resumes from its checkpoint when run again with the same arguments.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write, e.g. notes.jsonl.gz; its checkpoint is kept next to it.')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows read per database round trip and written between checkpoints.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes exporting an id range each; rows are then ordered within each range only.')
+        parser.add_argument('--restart', action='store_true', help='Discard the checkpoint of an earlier run.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive.')
+        if options['restart']:
+            remove_export(options['output'])
+
+        def progress(state):
+            if options['verbosity'] > 1:
+                self.stdout.write('%d rows written (up to %s)' % (state['rows'], state['position']))
+
+        try:
+            rows = export_notes(options['output'], options['format'], options['chunk_size'],
+                                options['workers'], progress)
+        except CheckpointMismatch as error:
+            raise CommandError('%s; run again with --restart to start over.' % error)
+        self.stdout.write(self.style.SUCCESS('Exported %d notes to %s.' % (rows, options['output'])))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from api_v1.helpers.importer import IMPORT_FORMATS, guess_format, import_notes, open_input, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Imports notes from a JSONL or CSV file (optionally gzip-compressed) with the fields of '
+            'NotesModelSerializer; `category` is a category id or name. Uses COPY on Postgres.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read, e.g. notes.jsonl.gz as written by export_notes.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Guessed from the file name by default.')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows written per transaction.')
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Create the categories named in the file that do not exist yet.')
+        parser.add_argument('--rejected', help='Dead-letter file for the rows that fail validation '
+                                               '(default: the input file name followed by .rejected.jsonl).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        rejected_path = options['rejected'] or options['input'] + '.rejected.jsonl'
+
+        def progress(counts):
+            if options['verbosity'] > 1:
+                self.stdout.write('{imported} rows imported, {rejected} rejected'.format(**counts))
+
+        try:
+            stream = open_input(options['input'])
+        except OSError as error:
+            raise CommandError(error)
+        with stream, open(rejected_path, 'w', encoding='utf-8') as rejected:
+            rows = read_rows(stream, options['format'] or guess_format(options['input']))
+            counts = import_notes(rows, rejected, options['batch_size'], options['create_categories'],
+                                  options['database'], progress)
+        self.stdout.write(self.style.SUCCESS('Imported {imported} notes.'.format(**counts)))
+        if counts['rejected']:
+            self.stdout.write(self.style.WARNING(
+                '{rejected} rows rejected, see {path}'.format(path=rejected_path, **counts)
+            ))
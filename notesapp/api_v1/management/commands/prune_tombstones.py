@@ -0,0 +1,28 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api_v1.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes the tombstones older than SYNC_TOMBSTONE_DAYS, in batches; sync tokens that old are refused anyway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30),
+                            help='Age in days of the oldest tombstone kept.')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Tombstones deleted per statement.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        deleted = 0
+        while True:
+            batch = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            deleted += Tombstone.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS('Deleted %d tombstones.' % deleted))
@@ -0,0 +1,72 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Keeps `Notes.search_vector` up to date on Postgres for every kind of write
+# (save, bulk_create, bulk_update, COPY); it only recomputes when title or body change.
+CREATE_TRIGGER_SQL = '''
+CREATE OR REPLACE FUNCTION api_v1_notes_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.body, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_v1_notes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, body ON api_v1_notes
+    FOR EACH ROW EXECUTE FUNCTION api_v1_notes_search_vector_update();
+
+UPDATE api_v1_notes SET title = title;
+'''
+
+DROP_TRIGGER_SQL = '''
+DROP TRIGGER IF EXISTS api_v1_notes_search_vector_trigger ON api_v1_notes;
+DROP FUNCTION IF EXISTS api_v1_notes_search_vector_update();
+'''
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    '''
+    AddIndex that only touches the database on Postgres; GIN indexes do not exist elsewhere.
+    '''
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER_SQL)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0002_created_at_id_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        AddPostgresIndex(
+            model_name='notes',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='notes_search_vector_idx'),
+        ),
+        # also backfills the existing rows
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -16,14 +21,123 @@ class CommonFieldsMixin(models.Model):
         abstract = True
 
 
+class CategoryQuerySet(models.QuerySet):
+    '''
+    Updates of the note summary denormalized on `Category`; see `api_v1.signals`.
+    `updated_at` is set from Python as `auto_now` does: SQLite's CURRENT_TIMESTAMP
+    keeps milliseconds only, which would break the versions of `version_etag`.
+    '''
+
+    def note_added(self, created_at):
+        created_at = Value(created_at, output_field=models.DateTimeField())
+        return self.update(
+            notes_count=F('notes_count') + 1,
+            last_note_at=Coalesce(Greatest('last_note_at', created_at), created_at),
+            updated_at=timezone.now(),
+        )
+
+    def note_removed(self):
+        # never below zero, even before the counts have been backfilled
+        return self.update(
+            notes_count=Greatest(F('notes_count') - 1, Value(0)),
+            last_note_at=Subquery(self.note_summaries().annotate(last=Max('created_at')).values('last')),
+            updated_at=timezone.now(),
+        )
+
+    def refresh_note_summary(self):
+        '''
+        Recomputes the summary of these categories from their notes.
+        '''
+        notes = self.note_summaries()
+        return self.update(
+            notes_count=Coalesce(Subquery(notes.annotate(count=Count('pk')).values('count')), Value(0)),
+            last_note_at=Subquery(notes.annotate(last=Max('created_at')).values('last')),
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def note_summaries():
+        return Notes.objects.filter(category=OuterRef('pk')).order_by().values('category')
+
+
 class Category(CommonFieldsMixin):
     name = models.CharField(max_length=250,null=False,unique=True)
+    # maintained on every note write (see api_v1.signals); rebuilt by `manage.py backfill_note_counts`
+    notes_count = models.PositiveIntegerField(default=0)
+    last_note_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # backs KeysetPagination's (created_at, id) ordering
+            models.Index(fields=['created_at', 'id'], name='category_created_at_id_idx'),
+            # rows changed since a sync token
+            models.Index(fields=['updated_at', 'id'], name='category_updated_at_id_idx'),
+        ]
 
 
 class Notes(CommonFieldsMixin):
     title = models.CharField(max_length=250,null=False,unique=False)
     body = models.TextField(null=False)
     category = models.ForeignKey(Category,on_delete=models.CASCADE,default=None,related_name='notes')
+    # weighted title + body; filled by a database trigger on Postgres, unused elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='notes_created_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='notes_search_vector_idx'),
+            # count and latest note of a category
+            models.Index(fields=['category', 'created_at'], name='notes_category_created_at_idx'),
+            models.Index(fields=['updated_at', 'id'], name='notes_updated_at_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the category the row was loaded with, so that a move can be counted on save
+        instance.loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # post_save updates the category counts inside this transaction
+        with transaction.atomic(using=using):
+            if not self._state.adding and getattr(self, 'loaded_category_id', None) is None:
+                self.loaded_category_id = type(self)._base_manager.using(using).filter(
+                    pk=self.pk
+                ).values_list('category_id', flat=True).first()
+            super().save(*args, **kwargs)
+        self.loaded_category_id = self.category_id
+
+
+class TombstoneQuerySet(models.QuerySet):
+
+    def bury(self, model, ids):
+        '''
+        Records the deletion of the rows of `model` with these ids, in one insert.
+        '''
+        label = model._meta.label_lower
+        return self.bulk_create([Tombstone(model=label, object_id=object_id) for object_id in ids])
+
+    def of(self, model):
+        return self.filter(model=model._meta.label_lower)
+
+
+class Tombstone(models.Model):
+    '''
+    A deleted Category or Notes row, reported to sync clients; recorded by
+    `api_v1.signals` and pruned by `manage.py prune_tombstones`.
+    '''
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TombstoneQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'deleted_at', 'id'], name='tombstone_model_deleted_at_idx')]
 
 
 class PersonManager(models.Manager):
@@ -1,15 +1,24 @@
 from rest_framework import serializers
 
 from .models import Category, Notes, User, Person
-from .helpers.validators import CategoryValidations
+from .helpers.validators import CategoryValidations, UniqueIntegrityMixin
+from .helpers.eager_loading import EagerLoadingMixin
+from .helpers.instrumentation import TimedDataMixin, TimedListSerializer
+from .helpers.bulk import BulkListSerializer
+from .helpers.passwords import BulkPasswordListSerializer
+from .helpers.sparse_fields import SparseFieldsMixin
+from .helpers.updates import InPlaceUpdateMixin
 
 
-class PersonModelSerializer(serializers.ModelSerializer):
+class PersonModelSerializer(TimedDataMixin, InPlaceUpdateMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    # what an update may change; the rest of a payload is validated but ignored
+    update_fields = ('first_name', 'last_name')
 
     class Meta:
         model = Person
         fields = ['username', 'email', 'first_name', 'last_name', 'password', 'is_superuser', 'is_active']
         extra_kwargs = {'password': {'write_only': True}, 'is_superuser': {'write_only': True}}
+        list_serializer_class = BulkPasswordListSerializer
 
     def create(self, validated_data):
         person = Person(
@@ -22,26 +31,25 @@ class PersonModelSerializer(serializers.ModelSerializer):
         person.save()
         return person
 
-    def update(self, instance, validated_data):
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.save()
-        return instance
-
-class NotesModelSerializer(serializers.ModelSerializer):
+class NotesModelSerializer(TimedDataMixin, EagerLoadingMixin, SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Notes
         fields = ['title', 'body', 'category']
+        list_serializer_class = BulkListSerializer
 
 
-class CategoryModelSerializer(serializers.ModelSerializer, CategoryValidations):
+class CategoryModelSerializer(TimedDataMixin, EagerLoadingMixin, SparseFieldsMixin, serializers.ModelSerializer,
+                              CategoryValidations):
     notes = NotesModelSerializer(many=True, read_only=True)
     # to display a string field instead of whole object
     # notes = serializers.SlugRelatedField(many=True, read_only=True, slug_field='title')
+    prefetch_related_fields = ['notes']
+
     class Meta:
         model = Category
         fields = ['name', 'notes']
+        list_serializer_class = TimedListSerializer
 
     def validate(self, data):
         '''
@@ -52,13 +60,17 @@ class CategoryModelSerializer(serializers.ModelSerializer, CategoryValidations):
         return data
 
     
-class CategorySerializer(serializers.ModelSerializer, CategoryValidations):
+class CategorySerializer(TimedDataMixin, UniqueIntegrityMixin, InPlaceUpdateMixin, SparseFieldsMixin,
+                         serializers.ModelSerializer, CategoryValidations):
     id = serializers.IntegerField(read_only=True)
+    update_fields = ('name',)
     name = serializers.CharField(required=True, max_length=255, validators=CategoryValidations().check_name_is_unique)
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'notes_count', 'last_note_at']
+        read_only_fields = ['notes_count', 'last_note_at']
         ordering = ['created_at']
+        list_serializer_class = BulkListSerializer
 
     def validate(self, data):
         '''
@@ -71,12 +83,28 @@ class CategorySerializer(serializers.ModelSerializer, CategoryValidations):
     def create(self, validated_data):
         return Category.objects.create(**validated_data)
 
-    def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.save()
-        return instance
-
     # def save(self):
     #     name = self.validated_data['name']
     #     pass
 
+
+
+class SyncNotesSerializer(TimedDataMixin, serializers.ModelSerializer):
+    '''
+    A note as sent to sync clients, with the id they key it on.
+    '''
+
+    class Meta:
+        model = Notes
+        fields = ['id', 'title', 'body', 'category', 'updated_at']
+        read_only_fields = fields
+        list_serializer_class = TimedListSerializer
+
+
+class SyncCategorySerializer(TimedDataMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'notes_count', 'last_note_at', 'updated_at']
+        read_only_fields = fields
+        list_serializer_class = TimedListSerializer
@@ -0,0 +1,83 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .helpers.bulk import bulk_saved
+from .helpers.cache import invalidate_model
+from .models import Category, Notes, Person, Tombstone
+
+CACHED_MODELS = [Category, Notes, Person, Person._meta.concrete_model]
+# models whose rows change when another model is written: note writes update category counts
+DEPENDENT_MODELS = {Notes: [Category]}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(bulk_saved)
+def invalidate_cached_responses(sender, **kwargs):
+    '''
+    Invalidates the cached responses built from a model whenever a row of it is written.
+    '''
+    if sender in CACHED_MODELS:
+        invalidate_model(sender)
+        for model in DEPENDENT_MODELS.get(sender, []):
+            invalidate_model(model)
+
+
+@receiver(post_save, sender=Notes)
+def count_saved_note(sender, instance, created, raw=False, using=None, **kwargs):
+    '''
+    Keeps `Category.notes_count` / `last_note_at` current; runs inside the
+    transaction `Notes.save` opens.
+    '''
+    if raw:
+        return
+    categories = Category.objects.using(using)
+    if created:
+        categories.filter(pk=instance.category_id).note_added(instance.created_at)
+    elif instance.loaded_category_id != instance.category_id:
+        categories.filter(pk__in=[instance.loaded_category_id, instance.category_id]).refresh_note_summary()
+
+
+def deleted_with_category(origin):
+    return isinstance(origin, Category) or (isinstance(origin, QuerySet) and origin.model is Category)
+
+
+@receiver(post_delete, sender=Notes)
+def count_deleted_note(sender, instance, using=None, origin=None, **kwargs):
+    if deleted_with_category(origin):
+        # the category is being deleted along with its notes
+        return
+    Category.objects.using(using).filter(pk=instance.category_id).note_removed()
+
+
+@receiver(pre_delete, sender=Category)
+def bury_category_notes(sender, instance, using=None, **kwargs):
+    '''
+    Records the tombstones of the notes a category deletion cascades to, in one insert.
+    '''
+    note_ids = Notes.objects.using(using).filter(category=instance).values_list('pk', flat=True)
+    Tombstone.objects.using(using).bury(Notes, note_ids)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Notes)
+def bury_deleted_row(sender, instance, using=None, origin=None, **kwargs):
+    '''
+    Records a tombstone for every deleted category and note, for sync clients (see `api_v1.helpers.sync`).
+    '''
+    if sender is Notes and deleted_with_category(origin):
+        # buried by bury_category_notes
+        return
+    Tombstone.objects.using(using).bury(sender, [instance.pk])
+
+
+@receiver(bulk_saved, sender=Notes)
+def count_bulk_saved_notes(sender, instances, previous=None, using=None, **kwargs):
+    '''
+    Recounts every category a bulk create or update added notes to or moved notes out of.
+    '''
+    category_ids = {instance.category_id for instance in instances}
+    category_ids.update(values['category'] for values in previous or [] if 'category' in values)
+    if category_ids:
+        Category.objects.using(using).filter(pk__in=category_ids).refresh_note_summary()
@@ -1,3 +1,1331 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import cbor2
+import msgpack
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .benchmarks import compare, endpoints
+from .helpers.cache import get_cache, response_cache_stats
+from .helpers.compression import CompressionMiddleware, choose_coding, compression_stats
+from .helpers.export import checkpoint_path, export_part, split_id_range
+from .helpers.fast_read import CompiledSerializer, NotCompilable, get_compiled
+from .helpers.instrumentation import InstrumentationMiddleware, request_stats, time_query
+from .helpers.passwords import hash_passwords
+from .helpers.pool import pool_stats
+from .helpers.replicas import PIN_COOKIE, PrimaryPinningMiddleware, ReplicaSelector
+from .helpers.schema import FINGERPRINT_KEY, schema_caches
+from .helpers.sync import encode_token
+from .helpers.throttles import AnonCounterRateThrottle, get_store
+from .models import Category, Notes, Tombstone, User
+from .serializers import CategoryModelSerializer, CategorySerializer, NotesModelSerializer, PersonModelSerializer
+from .views.Notes import NotesViewSet
+
+
+def create_categories(count, notes_per_category=2):
+    '''
+    Creates `count` categories, each with `notes_per_category` notes.
+    '''
+    start = Category.objects.count()
+    for i in range(start, start + count):
+        category = Category.objects.create(name='sport category %d' % i)
+        for j in range(notes_per_category):
+            Notes.objects.create(title='note %d' % j, body='body %d' % j, category=category)
+
+
+def errors_by_index(data):
+    '''
+    Normalizes list serializer errors, which are a list or a dict depending on DRF.
+    '''
+    return data if isinstance(data, dict) else dict(enumerate(data))
+
+
+class EagerLoadingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url):
+        create_categories(2)
+        few = self.count_queries(url)
+        cache.clear()
+        create_categories(20)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_viewset_list_queries_do_not_grow_with_rows(self):
+        self.assert_constant_queries(reverse('api_v1:categories-ViewSet-list'))
+
+    def test_generics_list_queries_do_not_grow_with_rows(self):
+        self.assert_constant_queries(reverse('api_v1:generics_categories'))
+
+    def test_function_view_queries_do_not_grow_with_rows(self):
+        self.assert_constant_queries(reverse('api_v2:fn_categories'))
+
+    def test_nested_notes_are_serialized(self):
+        create_categories(1, notes_per_category=3)
+        response = self.client.get(reverse('api_v1:categories-ViewSet-list'))
+        self.assertEqual(len(response.data[0]['notes']), 3)
+
+
+class StreamingListTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(3, notes_per_category=2)
+
+    def read_stream(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_stream_param_returns_json_array(self):
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'stream': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        rows = json.loads(self.read_stream(response))
+        self.assertEqual(rows, NotesModelSerializer(Notes.objects.order_by('pk'), many=True).data)
+
+    def test_ndjson_suffix_streams_one_row_per_line(self):
+        response = self.client.get('/api_v1/categories.ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_stream(response).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(json.loads(lines[0])['notes']), 2)
+
+    def test_chunked_stream_matches_unchunked_output(self):
+        with mock.patch.object(NotesViewSet, 'stream_chunk_size', 2):
+            response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'stream': '1'})
+            self.assertEqual(len(json.loads(self.read_stream(response))), 6)
+
+
+class BinaryFormatTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(3, notes_per_category=2)
+
+    def test_paginated_list_matches_json_through_accept_and_suffix(self):
+        url = reverse('api_v1:generics_categories')
+        expected = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+        response = self.client.get(url.rstrip('/') + '.cbor')
+        self.assertEqual(response['Content-Type'], 'application/cbor')
+        self.assertEqual(cbor2.loads(response.content), expected)
+
+    def test_binary_request_bodies_are_parsed(self):
+        category = Category.objects.first()
+        payload = {'title': 'binary note', 'body': 'body', 'category': category.pk}
+        response = self.client.post(reverse('api_v1:notes-ViewSet-list'), msgpack.packb(payload),
+                                    content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('api_v1:notes-ViewSet-list'), cbor2.dumps(dict(payload, title='cbor note')),
+                                    content_type='application/cbor')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Notes.objects.filter(title__in=['binary note', 'cbor note']).count(), 2)
+        response = self.client.post(reverse('api_v1:notes-ViewSet-list'), b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+    def test_streamed_lists_are_item_sequences(self):
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'stream': 'true'},
+                                   HTTP_ACCEPT='application/msgpack')
+        self.assertTrue(response.streaming)
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(b''.join(response.streaming_content))
+        self.assertEqual(list(unpacker), NotesModelSerializer(Notes.objects.order_by('pk'), many=True).data)
+
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'stream': 'true'}, HTTP_ACCEPT='application/cbor')
+        self.assertEqual(response['Content-Type'], 'application/cbor-seq')
+        stream = io.BytesIO(b''.join(response.streaming_content))
+        rows = []
+        while stream.tell() < len(stream.getbuffer()):
+            rows.append(cbor2.load(stream))
+        self.assertEqual(len(rows), 6)
+
+
+@override_settings(RESPONSE_COMPRESSION_CODINGS=['gzip'], RESPONSE_COMPRESSION_MIN_SIZE=1024)
+class CompressionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        compression_stats.clear()
+        self.client = APIClient()
+        create_categories(10, notes_per_category=5)
+
+    def test_coding_follows_client_weights_then_server_preference(self):
+        self.assertEqual(choose_coding('gzip;q=0.5, br', ['br', 'gzip']), 'br')
+        self.assertEqual(choose_coding('gzip, br', ['zstd', 'br', 'gzip']), 'br')
+        self.assertEqual(choose_coding('gzip;q=0, *;q=0.1', ['gzip', 'zstd']), 'zstd')
+        self.assertIsNone(choose_coding('identity', ['gzip']))
+        self.assertIsNone(choose_coding('', ['gzip']))
+
+    def test_large_responses_are_compressed_and_small_ones_are_not(self):
+        url = reverse('api_v1:generics_categories')
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+        self.assertLess(len(response.content), len(plain.content))
+
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=len(plain.content) + 1):
+            cache.clear()
+            self.assertFalse(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+
+    def test_cached_responses_are_compressed_once_per_fill(self):
+        url = reverse('api_v1:generics_categories')
+        for i in range(3):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        stats = compression_stats.report()['generics_categories']['gzip']
+        self.assertEqual((stats['compressed'], stats['precompressed']), (1, 3))
+        self.assertGreater(stats['ratio'], 1)
+
+    def test_streamed_lists_are_gzipped(self):
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'stream': 'true'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(b''.join(response.streaming_content)))), 50)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=0)
+    def test_version_etags_of_compressed_responses_still_match(self):
+        category = Category.objects.first()
+        url = reverse('api_v1:apiviews_categories', kwargs={'pk': category.pk})
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertRegex(response['ETag'], r'^"\d+-gzip"$')
+        weak = self.client.put(url, {'name': 'weak sport rename'}, format='json', HTTP_IF_MATCH='W/' + response['ETag'])
+        self.assertEqual(weak.status_code, 412)
+        self.assertIn('weak', weak.data['detail'])
+        renamed = self.client.put(url, {'name': 'renamed sport category'}, format='json', HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual(renamed.status_code, 201)
+
+    def test_async_chains_are_not_adapted_to_sync(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(CompressionMiddleware(get_response)))
+
+        async def scenario():
+            return await AsyncClient().get(reverse('api_v1:async-notes-ViewSet-list'), headers={'Accept-Encoding': 'gzip'})
+        # Django logs every middleware it has to adapt (with DEBUG on)
+        with override_settings(DEBUG=True, RESPONSE_COMPRESSION_MIN_SIZE=0), self.assertNoLogs('django.request', 'DEBUG'):
+            response = async_to_sync(scenario)()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 10)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_v1:sync')
+        create_categories(2, notes_per_category=2)
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_changes_and_deletions_since_the_token_are_returned(self):
+        first = self.sync()
+        self.assertEqual(len(first['categories']['changed']), 2)
+        self.assertEqual([row['id'] for row in first['notes']['changed']],
+                         list(Notes.objects.order_by('updated_at', 'pk').values_list('pk', flat=True)))
+        self.assertEqual(first['notes']['deleted'], [])
+        self.assertFalse(first['has_more'])
+        unchanged = self.sync(first['since'])
+        self.assertEqual((unchanged['notes'], unchanged['categories']['changed']), ({'changed': [], 'deleted': []}, []))
+
+        updated, deleted = Notes.objects.order_by('pk')[:2]
+        updated.title = 'edited title'
+        updated.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        changes = self.sync(unchanged['since'])
+        self.assertEqual([row['title'] for row in changes['notes']['changed']], ['edited title'])
+        self.assertEqual(changes['notes']['deleted'], [deleted_pk])
+        # the note count of its category changed
+        self.assertIn(deleted.category_id, [row['id'] for row in changes['categories']['changed']])
+
+    def test_category_deletion_buries_its_notes(self):
+        since = self.sync()['since']
+        category = Category.objects.order_by('pk').first()
+        category_pk, note_ids = category.pk, sorted(category.notes.values_list('pk', flat=True))
+        category.delete()
+        self.assertEqual(Tombstone.objects.of(Notes).count(), 2)
+        changes = self.sync(since)
+        self.assertEqual(changes['categories']['deleted'], [category_pk])
+        self.assertEqual(sorted(changes['notes']['deleted']), note_ids)
+
+    def test_limited_syncs_page_through_every_row(self):
+        seen, since, has_more = [], None, True
+        while has_more:
+            data = self.sync(since, limit=1)
+            seen += [row['id'] for row in data['notes']['changed']]
+            since, has_more = data['since'], data['has_more']
+        self.assertEqual(sorted(seen), sorted(Notes.objects.values_list('pk', flat=True)))
+
+    def test_limited_syncs_page_through_rows_older_than_the_tombstones(self):
+        Notes.objects.update(updated_at=timezone.now() - datetime.timedelta(days=60))
+        seen, since, has_more = [], None, True
+        while has_more:
+            data = self.sync(since, limit=1)
+            seen += [row['id'] for row in data['notes']['changed']]
+            since, has_more = data['since'], data['has_more']
+        self.assertEqual(sorted(seen), sorted(Notes.objects.values_list('pk', flat=True)))
+
+    def test_invalid_and_expired_tokens_are_refused(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'garbage'}).status_code, 400)
+        expired = encode_token({'notes.deleted': ['2000-01-01T00:00:00+00:00', 0]})
+        self.assertEqual(self.client.get(self.url, {'since': expired}).status_code, 410)
+
+
+class InPlaceUpdateTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='sport category to rename')
+        self.user = User.objects.create_user('renamed', 'renamed@example.com', 'password')
+
+    def statements(self, queries):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith(('SELECT', 'UPDATE'))]
+
+    def test_put_is_one_update_returning_the_row(self):
+        url = reverse('api_v1:apiviews_categories', kwargs={'pk': self.category.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, {'name': 'renamed sport category'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['name'], 'renamed sport category')
+        # the unique name check, then the update: the row itself is never read
+        select, update = self.statements(queries)
+        self.assertIn('"name" =', select)
+        self.assertIn('RETURNING', update)
+        self.assertEqual(self.client.get(url)['ETag'], response['ETag'])
+
+        missing = reverse('api_v1:apiviews_categories', kwargs={'pk': self.category.pk + 100})
+        self.assertEqual(self.client.put(missing, {'name': 'missing sport category'}, format='json').status_code, 404)
+
+    def test_if_match_only_overwrites_that_version(self):
+        url = reverse('api_v1:apiviews_categories', kwargs={'pk': self.category.pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.put(url, {'name': 'first sport rename'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response['ETag'], etag)
+        stale = self.client.put(url, {'name': 'second sport rename'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).name, 'first sport rename')
+        self.assertEqual(self.client.put(url, {'name': 'third sport rename'}, format='json',
+                                         HTTP_IF_MATCH=response['ETag']).status_code, 201)
+
+    def test_if_match_after_a_note_changed_the_category(self):
+        Notes.objects.create(title='a', body='body', category=self.category)
+        url = reverse('api_v1:apiviews_categories', kwargs={'pk': self.category.pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.put(url, {'name': 'renamed sport category'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 201)
+
+    def test_missing_users_are_404(self):
+        url = reverse('api_v1:user-ViewSet-detail', kwargs={'pk': self.user.pk + 100})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.patch(url, {'first_name': 'nobody'}, format='json').status_code, 404)
+
+    def test_partial_user_update_writes_the_changed_column_only(self):
+        url = reverse('api_v1:user-ViewSet-detail', kwargs={'pk': self.user.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'first_name': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['first_name'], 'changed')
+        [update] = self.statements(queries)
+        self.assertIn('SET "first_name" =', update)
+        self.assertNotIn('"password" =', update)
+        missing = reverse('api_v1:user-ViewSet-detail', kwargs={'pk': self.user.pk + 100})
+        self.assertEqual(self.client.patch(missing, {'first_name': 'nobody'}, format='json').status_code, 404)
+
+    def test_loaded_instances_save_changed_fields_only(self):
+        serializer = CategorySerializer(self.category, data={'name': self.category.name})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        self.assertEqual(self.statements(queries), [])
+
+        serializer = CategorySerializer(self.category, data={'name': 'another sport name'})
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        [update] = self.statements(queries)
+        self.assertNotIn('"notes_count"', update)
+
+
+class KeysetPaginationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(1, notes_per_category=25)
+
+    def walk(self, url, key):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['title'] for row in response.data['results']])
+            last_response, url = response, response.data['links'][key]
+        if key == 'previous':
+            pages.reverse()
+        return [title for page in pages for title in page], last_response
+
+    def test_pages_cover_every_row_once_in_both_directions(self):
+        expected = list(Notes.objects.order_by('created_at', 'id').values_list('title', flat=True))
+        forwards, last_page = self.walk(reverse('api_v1:notes-ViewSet-list') + '?cursor=', 'next')
+        self.assertEqual(forwards, expected)
+
+        backwards, first_page = self.walk(last_page.data['links']['previous'], 'previous')
+        self.assertEqual(backwards, expected[:20])
+        self.assertIsNone(first_page.data['links']['previous'])
+
+    def test_count_is_skipped_unless_requested(self):
+        url = reverse('api_v1:notes-ViewSet-list')
+        self.assertIsNone(self.client.get(url, {'cursor': ''}).data['count'])
+        self.assertEqual(self.client.get(url, {'cursor': '', 'count': 'exact'}).data['count'], 25)
+        self.assertEqual(self.client.get(url, {'cursor': '', 'count': 'estimate'}).data['count'], 25)
+
+    def test_keyset_pages_are_opt_in(self):
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'))
+        self.assertEqual(len(response.data), 25)
+        response = self.client.get(reverse('api_v1:cat-viewsets-list'), {'limit': 1, 'offset': 0})
+        self.assertEqual(set(response.data), {'count', 'next', 'previous', 'results'})
+        response = self.client.get(reverse('api_v1:cat-viewsets-list'), {'cursor': ''})
+        self.assertEqual(set(response.data), {'links', 'count', 'results'})
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkEndpointTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='sport category')
+        self.url = reverse('api_v1:notes-ViewSet-bulk')
+
+    def test_bulk_create_uses_constant_queries(self):
+        payload = [{'title': 'note %d' % i, 'body': 'body', 'category': self.category.pk} for i in range(50)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Notes.objects.count(), 50)
+        self.assertLess(len(context.captured_queries), 10)
+
+    def test_bulk_create_reports_errors_per_item_and_writes_nothing(self):
+        payload = [
+            {'title': 'valid', 'body': 'body', 'category': self.category.pk},
+            {'title': 'invalid', 'body': 'body', 'category': 999},
+        ]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = errors_by_index(response.data)
+        self.assertIn('category', errors[1])
+        self.assertFalse(errors.get(0))
+        self.assertEqual(Notes.objects.count(), 0)
+
+    def test_bulk_update_and_delete(self):
+        url = reverse('api_v1:cat-viewsets-bulk')
+        categories = [Category.objects.create(name='sport category number %d' % i) for i in range(3)]
+        payload = [{'id': category.pk, 'name': 'renamed sport %d' % category.pk} for category in categories]
+        response = self.client.put(url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Category.objects.get(pk=categories[0].pk).name, 'renamed sport %d' % categories[0].pk)
+
+        response = self.client.put(url, [{'id': 999, 'name': 'missing sport category'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.delete(url, [category.pk for category in categories], format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Category.objects.filter(pk__in=[c.pk for c in categories]).count(), 0)
+
+
+class BatchUniqueValidationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_v1:cat-viewsets-bulk')
+        Category.objects.create(name='existing sport')
+
+    def test_names_are_checked_with_a_single_query(self):
+        payload = [{'name': 'new sport number %d' % i} for i in range(20)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        lookups = [query for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(lookups), 1)
+
+    def test_existing_and_repeated_names_are_reported_per_item(self):
+        payload = [{'name': 'existing sport'}, {'name': 'repeated sport'}, {'name': 'repeated sport'}]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = errors_by_index(response.data)
+        self.assertEqual(errors[0]['name'][0], 'This name already does exists!')
+        self.assertFalse(errors.get(1))
+        self.assertEqual(errors[2]['name'][0], 'This name already does exists!')
+
+    @override_settings(OPTIMISTIC_UNIQUE_VALIDATION=True)
+    def test_optimistic_mode_maps_integrity_errors(self):
+        response = self.client.post(reverse('api_v1:apiviews_categories'), {'name': 'existing sport'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['name'][0], 'This name already does exists!')
+
+        response = self.client.post(self.url, [{'name': 'fresh sport'}, {'name': 'existing sport'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = errors_by_index(response.data)
+        self.assertEqual(errors[1]['name'][0], 'This name already does exists!')
+        self.assertFalse(Category.objects.filter(name='fresh sport').exists())
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_v1:categories-ViewSet-list')
+        create_categories(2)
+
+    def test_responses_are_shared_and_invalidated_on_write(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create(username='other'))
+        response = other_client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+        Notes.objects.create(title='new', body='body', category=Category.objects.first())
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(sum(len(row['notes']) for row in response.data), 5)
+
+        stats = response_cache_stats(['CategoryView.list'])['CategoryView.list']
+        self.assertEqual(stats, {'hits': 1, 'misses': 2})
+
+    def test_version_and_query_params_are_part_of_the_key(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, {'a': 1})['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('api_v2:categories-ViewSet-list')).status_code, 400)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': backend}):
+                self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+                Category.objects.create(name='another sport')
+                self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+
+class ConditionalGetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(1, notes_per_category=2)
+        self.category = Category.objects.get()
+
+    def test_unchanged_detail_returns_304_without_serializing(self):
+        url = reverse('api_v1:generics_categories', kwargs={'pk': self.category.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with mock.patch.object(CategoryModelSerializer, 'to_representation') as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        to_representation.assert_not_called()
+
+    def test_nested_note_changes_change_the_etag(self):
+        url = reverse('api_v1:generics_categories', kwargs={'pk': self.category.pk})
+        etag = self.client.get(url)['ETag']
+        self.category.notes.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_notes_list_and_user_detail(self):
+        url = reverse('api_v1:notes-ViewSet-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        user = User.objects.create(username='someone')
+        url = reverse('api_v1:user-ViewSet-detail', kwargs={'pk': user.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        User.objects.filter(pk=user.pk).update(first_name='changed')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_alone_never_gets_a_304(self):
+        url = reverse('api_v1:notes-ViewSet-list')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.category.notes.first().delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_missing_object_is_still_404(self):
+        url = reverse('api_v1:mixins_categories', kwargs={'pk': 999})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class FastReadTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(3)
+        User.objects.create(username='fast', email='fast@example.com', first_name='Fast', is_active=False)
+        User.objects.create(username='empty')
+
+    def test_compiled_output_is_byte_identical(self):
+        renderer = JSONRenderer()
+        for serializer_class in (CategorySerializer, NotesModelSerializer, PersonModelSerializer):
+            queryset = serializer_class.Meta.model.objects.order_by('pk')
+            compiled = get_compiled(serializer_class)
+            self.assertEqual(
+                renderer.render(compiled.serialize(compiled.values(queryset))),
+                renderer.render(serializer_class(queryset, many=True).data),
+            )
+
+    def test_nested_serializers_are_not_compiled(self):
+        self.assertIsNone(get_compiled(CategoryModelSerializer))
+        with self.assertRaises(NotCompilable):
+            CompiledSerializer(CategoryModelSerializer)
+
+    def test_list_endpoints_read_values(self):
+        with mock.patch.object(CategorySerializer, 'to_representation') as to_representation:
+            response = self.client.get(reverse('api_v1:mixins_categories'))
+        to_representation.assert_not_called()
+        self.assertEqual(len(response.data['results']), 3)
+        first = Category.objects.order_by('created_at', 'id')[0]
+        self.assertEqual(response.data['results'][0], CategorySerializer(first).data)
+        self.assertEqual(response.data['results'][0]['notes_count'], 2)
+
+
+class CounterThrottleTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def make_request(self):
+        request = APIRequestFactory().get('/')
+        request.user = AnonymousUser()
+        return Request(request)
+
+    def test_requests_over_the_rate_are_refused_until_the_window_ends(self):
+        throttle = AnonCounterRateThrottle()
+        throttle.rate, throttle.num_requests, throttle.duration = '3/minute', 3, 60
+        with mock.patch.object(AnonCounterRateThrottle, 'timer', return_value=120.0):
+            results = [throttle.allow_request(self.make_request(), None) for i in range(4)]
+            self.assertEqual(results, [True, True, True, False])
+            self.assertEqual(throttle.wait(), 60)
+        with mock.patch.object(AnonCounterRateThrottle, 'timer', return_value=180.0):
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+
+    def test_sliding_window_weighs_the_previous_window(self):
+        throttle = AnonCounterRateThrottle()
+        throttle.rate, throttle.num_requests, throttle.duration = '2/minute', 2, 60
+        throttle.algorithm = 'sliding'
+        with mock.patch.object(AnonCounterRateThrottle, 'timer', return_value=119.0):
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+        with mock.patch.object(AnonCounterRateThrottle, 'timer', return_value=125.0):
+            self.assertFalse(throttle.allow_request(self.make_request(), None))
+        with mock.patch.object(AnonCounterRateThrottle, 'timer', return_value=175.0):
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+
+    @override_settings(THROTTLE_STORE='api_v1.helpers.throttles.LocalThrottleStore')
+    def test_local_store_increments_atomically(self):
+        store = get_store()
+        store.clear()
+        threads = [threading.Thread(target=lambda: [store.incr('key', 60) for i in range(100)]) for j in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store.get('key'), 800)
+
+
+class AsyncViewSetTestCase(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_categories(2, notes_per_category=3)
+
+    def test_views_are_coroutines(self):
+        match = resolve(reverse('api_v1:async-notes-ViewSet-list'))
+        self.assertTrue(iscoroutinefunction(match.func))
+
+    def test_list_retrieve_and_create(self):
+        async def scenario():
+            client = AsyncClient()
+            response = await client.get(reverse('api_v1:async-notes-ViewSet-list'), {'page_size': 4})
+            self.assertEqual(response.status_code, 200)
+            body = json.loads(response.content)
+            self.assertEqual(len(body['results']), 4)
+            self.assertIsNotNone(body['links']['next'])
+
+            category = await Category.objects.afirst()
+            response = await client.get(reverse('api_v1:async-cat-viewsets-detail', kwargs={'pk': category.pk}))
+            self.assertEqual(json.loads(response.content), json.loads(JSONRenderer().render(CategorySerializer(category).data)))
+            response = await client.get(reverse('api_v1:async-cat-viewsets-detail', kwargs={'pk': 999}))
+            self.assertEqual(response.status_code, 404)
+
+            response = await client.post(reverse('api_v1:async-cat-viewsets-list'), {'name': category.name},
+                                         content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            response = await client.post(reverse('api_v1:async-notes-ViewSet-list'),
+                                         {'title': 'async', 'body': 'body', 'category': category.pk},
+                                         content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertTrue(await Notes.objects.filter(title='async').aexists())
+        async_to_sync(scenario)()
+
+    def test_async_throttle(self):
+        async def scenario():
+            client = AsyncClient()
+            with mock.patch.object(AnonCounterRateThrottle, 'get_rate', return_value='2/minute'):
+                statuses = [(await client.get(reverse('api_v1:async-cat-viewsets-list'))).status_code for i in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+        async_to_sync(scenario)()
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_v1:notes-ViewSet-search')
+        category = Category.objects.create(name='sport category')
+        for title, body in [
+            ('running shoes', 'what to wear for a marathon'),
+            ('groceries', 'shoes polish and bread'),
+            ('marathon plan', 'long runs with new shoes'),
+            ('unrelated', 'nothing to see'),
+        ]:
+            Notes.objects.create(title=title, body=body, category=category)
+
+    def test_hits_are_ranked_title_matches_first(self):
+        response = self.client.get(self.url, {'q': 'shoes'})
+        self.assertEqual(response.status_code, 200)
+        titles = [note['title'] for note in response.data['results']]
+        self.assertEqual(titles[0], 'running shoes')
+        self.assertCountEqual(titles[1:], ['groceries', 'marathon plan'])
+
+    def test_every_term_must_match(self):
+        response = self.client.get(self.url, {'q': 'marathon shoes'})
+        titles = [note['title'] for note in response.data['results']]
+        self.assertCountEqual(titles, ['running shoes', 'marathon plan'])
+
+    def test_hits_are_paginated_by_rank(self):
+        titles = []
+        url, params = self.url, {'q': 'shoes', 'page_size': 1}
+        while url:
+            response = self.client.get(url, params)
+            titles += [note['title'] for note in response.data['results']]
+            url, params = response.data['links']['next'], None
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(titles[0], 'running shoes')
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        request_stats.clear()
+        self.client = APIClient()
+        create_categories(3)
+
+    def test_server_timing_reports_queries_and_phases(self):
+        response = self.client.get(reverse('api_v1:apiviews_categories'))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        for phase in ('serializer', 'render', 'throttle', 'total'):
+            self.assertRegex(timing, r'%s;dur=[\d.]+' % phase)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('api_v1:apiviews_categories'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(request_stats.report(), {})
+
+    def test_report_aggregates_per_url_name_for_admins_only(self):
+        for i in range(3):
+            self.client.get(reverse('api_v1:apiviews_categories'))
+        self.client.get(reverse('api_v1:mixins_categories'))
+        url = reverse('api_v1:instrumentation_report')
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        report = self.client.get(url).data
+        self.assertEqual(report['apiviews_categories']['samples'], 3)
+        self.assertEqual(report['mixins_categories']['samples'], 1)
+        self.assertEqual(set(report['apiviews_categories']['queries']), {'p50', 'p95', 'p99'})
+        self.assertGreater(report['apiviews_categories']['queries']['p50'], 0)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertNotIn('apiviews_categories', self.client.get(url).data)
+
+    def test_async_chains_stay_async(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(InstrumentationMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(InstrumentationMiddleware(lambda request: None)))
+
+    def test_async_requests_are_instrumented(self):
+        async def scenario():
+            return await AsyncClient().get(reverse('api_v1:async-notes-ViewSet-list'))
+        response = async_to_sync(scenario)()
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertEqual(request_stats.report()['async-notes-ViewSet-list']['samples'], 1)
+
+    def test_concurrent_async_requests_count_their_own_queries(self):
+        url = reverse('api_v1:async-notes-ViewSet-list')
+
+        async def scenario(requests):
+            return await asyncio.gather(*(AsyncClient().get(url) for i in range(requests)))
+        alone, = async_to_sync(scenario)(1)
+        concurrent = async_to_sync(scenario)(2)
+        self.assertRegex(alone['Server-Timing'], r'desc="[1-9]\d* queries"')
+        queries = re.search(r'desc="\d+ queries"', alone['Server-Timing']).group()
+        self.assertEqual([re.search(r'desc="\d+ queries"', response['Server-Timing']).group()
+                          for response in concurrent], [queries, queries])
+        self.assertEqual(connection.execute_wrappers.count(time_query), 1)
+
+
+class ConnectionPoolTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_databases_without_a_pool_report_none(self):
+        self.assertIsNone(pool_stats('default'))
+        url = reverse('api_v1:connection_pools')
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertEqual(self.client.get(url).data['default'], None)
+
+    def test_pool_counters_are_renamed(self):
+        pool = mock.Mock(min_size=2, max_size=10, timeout=5.0)
+        pool.get_stats.return_value = {'requests_num': 7, 'requests_queued': 2, 'requests_errors': 1, 'pool_size': 3}
+        with mock.patch('api_v1.helpers.pool.connection_pool', return_value=pool):
+            stats = pool_stats('default')
+        self.assertEqual(
+            {name: stats[name] for name in ('checkouts', 'waits', 'timeouts', 'size', 'wait_ms', 'max_size')},
+            {'checkouts': 7, 'waits': 2, 'timeouts': 1, 'size': 3, 'wait_ms': 0, 'max_size': 10},
+        )
+
+
+class BenchmarkTestCase(TestCase):
+
+    # benchmarks request `localhost`, which only DEBUG allows
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_endpoint_benchmark_covers_every_view_style(self):
+        with mock.patch.object(endpoints, 'REPEAT', 1):
+            results = endpoints.run(30)
+        names = {row['name'] for row in results}
+        for name, url_name, detail, query, paginated in endpoints.ENDPOINTS:
+            self.assertIn(name, names)
+        for row in results:
+            self.assertGreater(row['queries'], 0, row['name'])
+        self.assertFalse(Category.objects.exists())
+
+    def test_compare_reports_regressions_beyond_the_threshold(self):
+        baseline = [
+            {'name': 'a', 'rows': 10, 'seconds': 0.010, 'p50_ms': 10.0, 'queries': 2, 'peak_kib': 100.0},
+            {'name': 'b', 'rows': 10, 'seconds': 0.0001, 'p50_ms': 0.1, 'queries': 1, 'peak_kib': 100.0},
+        ]
+        results = [
+            {'name': 'a', 'rows': 10, 'seconds': 0.011, 'p50_ms': 15.0, 'queries': 3, 'peak_kib': 110.0},
+            # tripled, but within timing noise
+            {'name': 'b', 'rows': 10, 'seconds': 0.0003, 'p50_ms': 0.3, 'queries': 1, 'peak_kib': 100.0},
+            {'name': 'c', 'rows': 10, 'seconds': 1.0},
+        ]
+        regressions = compare(results, baseline, threshold=0.2)
+        self.assertEqual({(row['name'], row['metric']) for row in regressions}, {('a', 'p50_ms'), ('a', 'queries')})
+
+
+class SparseFieldsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_categories(3)
+
+    def test_fields_and_omit_shape_nested_output(self):
+        url = reverse('api_v1:categories-ViewSet-list')
+        response = self.client.get(url, {'fields': 'name,notes.title'})
+        self.assertEqual(set(response.data[0]), {'name', 'notes'})
+        self.assertEqual(set(response.data[0]['notes'][0]), {'title'})
+
+        response = self.client.get(url, {'omit': 'notes.body'})
+        self.assertEqual(set(response.data[0]['notes'][0]), {'title', 'category'})
+
+    def test_unrequested_relations_are_not_prefetched(self):
+        url = reverse('api_v1:categories-ViewSet-list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'name'})
+        self.assertEqual(response.data[0], {'name': 'sport category 0'})
+        sql = [query['sql'] for query in context.captured_queries if 'api_v1_' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('created_at', sql[0])
+        self.assertNotIn('api_v1_notes', sql[0])
+
+    def test_nested_projection_keeps_the_join_column(self):
+        url = reverse('api_v1:categories-ViewSet-list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'notes.title'})
+        self.assertEqual(len(response.data[0]['notes']), 2)
+        notes_sql = [query['sql'] for query in context.captured_queries if 'FROM "api_v1_notes"' in query['sql']]
+        self.assertEqual(len(notes_sql), 1)
+        self.assertNotIn('"body"', notes_sql[0])
+
+    def test_compiled_lists_honour_the_selection(self):
+        response = self.client.get(reverse('api_v1:cat-viewsets-list'), {'fields': 'name', 'cursor': ''})
+        self.assertEqual(set(response.data['results'][0]), {'name'})
+        self.assertIsNotNone(response.data['links'])
+        response = self.client.get(reverse('api_v1:notes-ViewSet-list'), {'omit': 'body'})
+        self.assertEqual(set(response.data[0]), {'title', 'category'})
+
+    def test_writes_validate_every_field(self):
+        response = self.client.post(reverse('api_v1:cat-viewsets-list') + '?fields=id', {'name': 'another sport category'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.data), {'id', 'name', 'notes_count', 'last_note_at'})
+
+
+class NoteSummaryTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.first, self.second = [Category.objects.create(name='sport category %d' % i) for i in range(2)]
+
+    def summary(self, category):
+        category.refresh_from_db()
+        return category.notes_count, category.last_note_at
+
+    def test_counts_follow_create_move_and_delete(self):
+        note = Notes.objects.create(title='a', body='body', category=self.first)
+        later = Notes.objects.create(title='b', body='body', category=self.first)
+        self.assertEqual(self.summary(self.first), (2, later.created_at))
+
+        later = Notes.objects.get(pk=later.pk)
+        later.category = self.second
+        later.save()
+        self.assertEqual(self.summary(self.first), (1, note.created_at))
+        self.assertEqual(self.summary(self.second), (1, later.created_at))
+
+        note.delete()
+        self.assertEqual(self.summary(self.first), (0, None))
+
+    def test_bulk_writes_are_counted(self):
+        url = reverse('api_v1:notes-ViewSet-bulk')
+        payload = [{'title': 'note %d' % i, 'body': 'body', 'category': self.first.pk} for i in range(3)]
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, 201)
+        self.assertEqual(self.summary(self.first)[0], 3)
+
+        ids = list(Notes.objects.values_list('pk', flat=True))
+        self.client.delete(url, ids[:1], format='json')
+        self.assertEqual(self.summary(self.first)[0], 2)
+
+    def test_counts_are_listed_without_reading_notes(self):
+        Notes.objects.create(title='a', body='body', category=self.first)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api_v1:cat-viewsets-list'))
+        self.assertEqual([row['notes_count'] for row in response.data['results']], [1, 0])
+        self.assertFalse(any('api_v1_notes' in query['sql'] for query in context.captured_queries))
+
+    def test_backfill_recomputes_every_category(self):
+        Notes.objects.create(title='a', body='body', category=self.first)
+        Category.objects.update(notes_count=0, last_note_at=None)
+        call_command('backfill_note_counts', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(self.summary(self.first)[0], 1)
+        self.assertEqual(self.summary(self.second), (0, None))
+
+
+class ExportNotesTestCase(TestCase):
+
+    def setUp(self):
+        create_categories(3, notes_per_category=3)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'notes.gz')
+        ordered = Notes.objects.order_by('created_at', 'id')
+        self.expected = NotesModelSerializer(ordered, many=True).data
+
+    def read_lines(self):
+        with gzip.open(self.path, 'rt') as export:
+            return export.read().splitlines()
+
+    def test_jsonl_matches_the_serializer(self):
+        call_command('export_notes', self.path, chunk_size=4, stdout=io.StringIO())
+        self.assertEqual([json.loads(line) for line in self.read_lines()], self.expected)
+        self.assertFalse(os.path.exists(checkpoint_path(self.path)))
+
+    def test_csv_has_a_header_and_a_row_per_note(self):
+        call_command('export_notes', self.path, format='csv', stdout=io.StringIO())
+        rows = list(csv.DictReader(self.read_lines()))
+        self.assertEqual(rows, [{key: str(value) for key, value in note.items()} for note in self.expected])
+
+    def test_resumes_after_an_interruption(self):
+        def interrupt(state):
+            # simulates a crash while the second chunk is half written
+            with open(self.path, 'ab') as export:
+                export.write(b'partial chunk')
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            export_part(self.path, 'jsonl', 4, progress=interrupt)
+        with open(checkpoint_path(self.path)) as checkpoint:
+            self.assertEqual(json.load(checkpoint)['rows'], 4)
+
+        output = io.StringIO()
+        call_command('export_notes', self.path, chunk_size=4, stdout=output)
+        self.assertEqual([json.loads(line) for line in self.read_lines()], self.expected)
+        self.assertIn('Exported 9 notes', output.getvalue())
+
+    def test_checkpoint_of_another_format_is_refused(self):
+        with self.assertRaises(KeyboardInterrupt):
+            export_part(self.path, 'jsonl', 4, progress=mock.Mock(side_effect=KeyboardInterrupt))
+        with self.assertRaisesMessage(CommandError, '--restart'):
+            call_command('export_notes', self.path, format='csv', stdout=io.StringIO())
+        call_command('export_notes', self.path, format='csv', restart=True, stdout=io.StringIO())
+        self.assertEqual(len(self.read_lines()), 10)
+
+    def test_id_ranges_cover_every_note(self):
+        ranges = split_id_range(4)
+        ids = Notes.objects.values_list('id', flat=True)
+        for pk in ids:
+            self.assertEqual(sum(1 for low, high in ranges if low <= pk < high), 1)
+        self.assertLessEqual(len(ranges), 4)
+
+
+class ImportNotesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='sport category')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with (gzip.open if name.endswith('.gz') else open)(path, 'wt') as source:
+            source.write(content)
+        return path
+
+    def rejected(self, path):
+        with open(path + '.rejected.jsonl') as rejected:
+            return [json.loads(line) for line in rejected]
+
+    def test_jsonl_rows_are_validated_and_loaded(self):
+        lines = [
+            {'title': 'by id', 'body': 'body', 'category': self.category.pk},
+            {'title': 'by name', 'body': 'body', 'category': 'sport category'},
+            {'title': '', 'body': 'body', 'category': self.category.pk},
+            {'title': 'x' * 251, 'body': 'body', 'category': 'unknown sport'},
+        ]
+        path = self.write('notes.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n')
+        output = io.StringIO()
+        call_command('import_notes', path, batch_size=1, stdout=output)
+
+        self.assertEqual(sorted(Notes.objects.values_list('title', flat=True)), ['by id', 'by name'])
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.notes_count, 2)
+        rejected = self.rejected(path)
+        self.assertEqual([row['line'] for row in rejected], [3, 4, 5])
+        self.assertEqual(set(rejected[0]['errors']), {'title'})
+        self.assertEqual(set(rejected[1]['errors']), {'title', 'category'})
+        self.assertIn('3 rows rejected', output.getvalue())
+
+    def test_new_categories_pass_the_serializer_validations(self):
+        path = self.write('notes.csv', 'title,body,category\na,body,new sport category\nb,body,chess club\n'
+                                       'c,body,new sport category\n')
+        call_command('import_notes', path, create_categories=True, stdout=io.StringIO())
+
+        created = Category.objects.get(name='new sport category')
+        self.assertEqual(created.notes_count, 2)
+        self.assertFalse(Category.objects.filter(name='chess club').exists())
+        self.assertEqual(self.rejected(path)[0]['errors'], {'category': ['Name does not contain sport.']})
+
+    def test_imports_what_export_notes_wrote(self):
+        create_categories(2)
+        path = os.path.join(self.directory.name, 'notes.csv.gz')
+        call_command('export_notes', path, format='csv', stdout=io.StringIO())
+        exported = NotesModelSerializer(Notes.objects.order_by('created_at', 'id'), many=True).data
+        Notes.objects.all().delete()
+
+        call_command('import_notes', path, stdout=io.StringIO())
+        self.assertEqual(NotesModelSerializer(Notes.objects.order_by('id'), many=True).data, exported)
+        self.assertEqual(self.rejected(path), [])
+
+
+class PasswordHashingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_hashes_are_returned_in_order(self):
+        passwords = ['password %d' % i for i in range(4)]
+        with override_settings(PASSWORD_HASH_WORKERS=2):
+            hashed = hash_passwords(passwords)
+        self.assertTrue(all(check_password(password, encoded) for password, encoded in zip(passwords, hashed)))
+        self.assertTrue(hashed[0].startswith('scrypt$'))
+
+    def user_payloads(self, count, **extra):
+        return [dict({'username': 'user%d' % i, 'email': 'user%d@example.com' % i, 'first_name': 'first',
+                      'last_name': 'last', 'password': 'secret %d' % i}, **extra) for i in range(count)]
+
+    def test_bulk_endpoint_creates_users_with_hashed_passwords(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        payload = self.user_payloads(3)
+        response = self.client.post(reverse('api_v1:user-ViewSet-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('password', response.data[0])
+        for i in range(3):
+            self.assertTrue(User.objects.get(username='user%d' % i).check_password('secret %d' % i))
+
+        response = self.client.post(reverse('api_v1:user-ViewSet-bulk'), payload[:1], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 3)
+
+    def test_bulk_endpoint_is_admin_only(self):
+        response = self.client.post(reverse('api_v1:user-ViewSet-bulk'), self.user_payloads(1), format='json')
+        self.assertIn(response.status_code, (401, 403))
+        self.assertFalse(User.objects.exists())
+
+    def test_bulk_endpoint_ignores_superuser_and_active_flags(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        payload = self.user_payloads(2, is_superuser=True, is_active=False)
+        response = self.client.post(reverse('api_v1:user-ViewSet-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        for user in User.objects.filter(username__startswith='user'):
+            self.assertFalse(user.is_superuser)
+            self.assertTrue(user.is_active)
+
+    def test_older_hashes_are_upgraded_on_login(self):
+        user = User.objects.create(username='legacy', password=make_password('secret', hasher='pbkdf2_sha1'))
+        self.assertIsNotNone(authenticate(username='legacy', password='secret'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+    def test_raised_parameters_rehash_on_login(self):
+        with override_settings(PASSWORD_HASHER_PARAMETERS={'scrypt': {'work_factor': 2 ** 12}}):
+            user = User.objects.create(username='cheap', password=make_password('secret'))
+        self.assertFalse(user.password.startswith('scrypt$16384$'))
+        self.assertIsNotNone(authenticate(username='cheap', password='secret'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$16384$'))
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class SchemaTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.schema_cache = next(schema_caches())
+        self.addCleanup(setattr, self.schema_cache, 'artifact', self.schema_cache.artifact)
+        self.addCleanup(self.schema_cache.clear)
+        self.schema_cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def use_artifact(self, schema):
+        self.schema_cache.artifact = os.path.join(self.directory.name, 'schema.yml')
+        self.schema_cache.write_artifact(schema)
+
+    def test_schema_is_served_once_per_etag(self):
+        response = self.client.get('/api_v1/openapi')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/api_v1/notes/', response.content)
+
+        with mock.patch.object(type(self.schema_cache), 'generate') as generate:
+            cached = self.client.get('/api_v1/openapi', HTTP_IF_NONE_MATCH=response['ETag'])
+            as_json = self.client.get('/api_v1/openapi', {'format': 'openapi-json'})
+        generate.assert_not_called()
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(json.loads(as_json.content)['info'][FINGERPRINT_KEY], self.schema_cache.fingerprint())
+        self.assertNotEqual(as_json['ETag'], response['ETag'])
+
+    def test_artifact_is_used_only_while_it_is_current(self):
+        schema = self.schema_cache.generate()
+        schema['info']['description'] = 'from the artifact'
+        self.use_artifact(schema)
+        self.assertIn(b'from the artifact', self.client.get('/api_v1/openapi').content)
+
+        schema['info'][FINGERPRINT_KEY] = 'stale'
+        self.use_artifact(schema)
+        self.schema_cache.clear()
+        self.assertNotIn(b'from the artifact', self.client.get('/api_v1/openapi').content)
+        self.assertEqual(self.schema_cache.source, 'generated')
+
+    def test_check_schema_reports_drift(self):
+        schema = self.schema_cache.generate()
+        del schema['paths']['/api_v1/notes/']
+        self.use_artifact(schema)
+        output = io.StringIO()
+        with self.assertRaisesMessage(CommandError, 'out of date'):
+            call_command('check_schema', stdout=output)
+        self.assertIn('+  /api_v1/notes/:', output.getvalue())
+
+        call_command('check_schema', write=True, stdout=io.StringIO())
+        call_command('check_schema', stdout=io.StringIO())
+
+    def test_bulk_operations_have_distinct_ids(self):
+        paths = self.schema_cache.generate()['paths']
+        operation_ids = [operation['operationId'] for path in ('/api_v1/notes/bulk/', '/api_v1/cat/bulk/')
+                         for operation in paths[path].values()]
+        self.assertEqual(len(set(operation_ids)), 8)
+        self.assertIn('bulkDestroyNotes', operation_ids)
+        # the other actions of those views keep their names
+        self.assertEqual(paths['/api_v1/notes/']['get']['operationId'], 'listNotesViewSets')
+        self.assertEqual(paths['/api_v1/cat/']['get']['operationId'], 'listCategories')
+
+    def test_committed_schema_is_current(self):
+        call_command('check_schema', stdout=io.StringIO())
+
+
+REPLICA = 'replica_test'
+
+if REPLICA not in connections.settings:
+    # a second SQLite database standing in for a replica of `default`; registered on
+    # import, since the test runner creates the databases of every test case first
+    connections.settings[REPLICA] = connections.configure_settings({
+        'default': {'ENGINE': 'django.db.backends.sqlite3'},
+        REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    })[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_SELECTION='round_robin', REPLICA_MAX_LAG=None)
+class ReplicaRoutingTestCase(TestCase):
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.primary = Category.objects.create(name='sport on the primary')
+        # ids of their own, so that a read on the wrong database finds nothing
+        self.replica = Category.objects.using(REPLICA).create(pk=self.primary.pk + 100, name='sport on the replica')
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [category['name'] for category in results]
+
+    def test_opted_in_reads_go_to_the_replica(self):
+        self.assertEqual(self.names(reverse('api_v1:categories-ViewSet-list')), ['sport on the replica'])
+        self.assertEqual(self.names(reverse('api_v1:generics_categories')), ['sport on the replica'])
+        self.assertEqual(self.names(reverse('api_v1:cat-viewsets-list')), ['sport on the primary'])
+
+    def test_writes_go_to_the_primary_and_pin_the_client(self):
+        url = reverse('api_v1:generics_categories', kwargs={'pk': self.replica.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # the row only exists on the replica
+        self.assertEqual(self.client.put(url, {'name': 'renamed sport category'}, format='json').status_code, 404)
+
+        response = self.client.post(reverse('api_v1:notes-ViewSet-list'),
+                                    {'title': 'a', 'body': 'body', 'category': self.primary.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(Notes.objects.using(REPLICA).exists())
+        self.assertEqual(self.names(reverse('api_v1:categories-ViewSet-list')), ['sport on the primary'])
+
+        self.client.cookies[PIN_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.names(reverse('api_v1:categories-ViewSet-list')), ['sport on the replica'])
+
+    def test_async_chains_read_from_replicas_and_pin_writers(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(PrimaryPinningMiddleware(get_response)))
+
+        async def scenario():
+            client = AsyncClient()
+            response = await client.get(reverse('api_v1:categories-ViewSet-list'))
+            self.assertEqual(json.loads(response.content)[0]['name'], 'sport on the replica')
+            response = await client.post(reverse('api_v1:async-notes-ViewSet-list'),
+                                         {'title': 'a', 'body': 'body', 'category': self.primary.pk},
+                                         content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertIn(PIN_COOKIE, response.cookies)
+            client.cookies[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+            return await client.get(reverse('api_v1:categories-ViewSet-list'))
+        response = async_to_sync(scenario)()
+        self.assertEqual([category['name'] for category in json.loads(response.content)], ['sport on the primary'])
+
+    def test_replica_responses_are_cached_for_the_pin_time(self):
+        store = get_cache()
+        with override_settings(RESPONSE_CACHE_TIMEOUT=900, REPLICA_PIN_SECONDS=5):
+            with mock.patch.object(store, 'set', wraps=store.set) as cache_set:
+                self.assertEqual(self.names(reverse('api_v1:categories-ViewSet-list')), ['sport on the replica'])
+        timeouts = [call.kwargs['timeout'] for call in cache_set.call_args_list if ':entry:' in call.args[0]]
+        self.assertEqual(timeouts, [5])
+
+    def test_streamed_lists_read_from_the_replica(self):
+        response = self.client.get(reverse('api_v1:categories-ViewSet-list'), {'stream': 'true'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([category['name'] for category in rows], ['sport on the replica'])
+
+    def test_round_robin_and_least_lag(self):
+        selector = ReplicaSelector()
+        with override_settings(DATABASE_REPLICAS=['a', 'b']):
+            self.assertEqual([selector.choose() for i in range(3)], ['a', 'b', 'a'])
+            with mock.patch('api_v1.helpers.replicas.replica_lag', side_effect=lambda alias: {'a': 3.0, 'b': 1.0}[alias]):
+                with override_settings(REPLICA_SELECTION='least_lag'):
+                    self.assertEqual(selector.choose(), 'b')
+                with override_settings(REPLICA_MAX_LAG=0.5, REPLICA_LAG_CHECK_INTERVAL=0):
+                    self.assertIsNone(selector.choose())
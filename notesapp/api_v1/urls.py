@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework import routers
 
-from .views import Category, Notes, User
+from .views import Category, Instrumentation, Notes, Sync, User
 
 app_name = 'api_v1'
 
@@ -16,6 +16,10 @@ router.register(r'notes', Notes.NotesViewSet, 'notes-ViewSet')
 router.register(r'categories', Category.CategoryView, 'categories-ViewSet')
 router.register(r'cat', Category.CategoryViewSet, 'cat-viewsets')
 
+# async views, served natively under ASGI
+router.register(r'async/notes', Notes.AsyncNotesViewSet, 'async-notes-ViewSet')
+router.register(r'async/cat', Category.AsyncCategoryViewSet, 'async-cat-viewsets')
+
 urlpatterns = [
     # function based views urls
     path('fn/categories', list_categories, name='fn_categories'),
@@ -23,6 +27,7 @@ urlpatterns = [
     # class based views
     # api views urls
     path('cls-apiviews/categories/', Category.CategoryAPIView.as_view(), name='apiviews_categories'),
+    path('cls-apiviews/categories/<int:pk>/', Category.CategoryAPIView.as_view(), name='apiviews_categories'),
 
     # mixins urls
     path('cls-mixins/categories/', Category.CategoryListMixins.as_view(), name='mixins_categories'),
@@ -31,5 +36,13 @@ urlpatterns = [
     # generic ApiViews urls
     path('cls-generics/categories/', Category.CategoryListGenericApiView.as_view(), name='generics_categories'),
     path('cls-generics/categories/<int:pk>/', Category.CategoryDetailGenericApiView.as_view(), name='generics_categories'),
+
+    # delta sync of categories and notes
+    path('sync/', Sync.SyncView.as_view(), name='sync'),
+
+    # per-view timings of sampled requests, admin only
+    path('instrumentation/', Instrumentation.InstrumentationReportView.as_view(), name='instrumentation_report'),
+    path('instrumentation/pools/', Instrumentation.ConnectionPoolView.as_view(), name='connection_pools'),
+    path('instrumentation/compression/', Instrumentation.CompressionReportView.as_view(), name='compression_report'),
 ]
 urlpatterns += router.urls
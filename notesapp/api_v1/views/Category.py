@@ -1,19 +1,25 @@
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
-
 from rest_framework.views import APIView
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework import status, viewsets, mixins, generics
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination, CursorPagination
 
-from api_v1.models import Category
+from api_v1.models import Category, Notes
 from api_v1.serializers import CategoryModelSerializer, CategorySerializer
 from api_v1.helpers.throttles import UserThrottlePerMinute
+from api_v1.helpers.eager_loading import EagerLoadingViewMixin
+from api_v1.helpers.streaming import StreamingListMixin
+from api_v1.helpers.cache import cache_response
+from api_v1.helpers.conditional import ConditionalRetrieveMixin
+from api_v1.helpers.fast_read import FastListMixin, afast_serialize
+from api_v1.helpers.async_views import AsyncViewSetMixin
+from api_v1.helpers.pagination import KeysetOptInMixin, KeysetPagination
+from api_v1.helpers.bulk import BulkModelMixin
+from api_v1.helpers.replicas import ReplicaReadMixin
+from api_v1.helpers.updates import requested_versions, version_etag
 
 
 class WrongVersion(APIException):
@@ -47,7 +53,7 @@ class StandardCursorPagination(CursorPagination):
     consistent ordering to paginate against.
     '''
     page_size = 10
-    ordering ='created_at'
+    ordering = ('created_at', 'id')
     page_query_param = 'page'
     max_page_size = 10
 
@@ -62,12 +68,19 @@ class CategoryAPIView(APIView):
     '''
     pagination_class = StandardResultsSetPagination
     throttle_classes = [UserThrottlePerMinute]
-    def get(self, request, format=None):
+    def get(self, request, pk=None, format=None):
         """
-        Return a list of all categories.
+        Return a list of all categories, or one category with its version as ETag.
         """
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
+        if pk is not None:
+            category = Category.objects.filter(pk=pk).first()
+            if category is None:
+                return Response('category not found', status=status.HTTP_404_NOT_FOUND)
+            response = Response(CategorySerializer(category, context={'request': request}).data, status=status.HTTP_200_OK)
+            response['ETag'] = version_etag(category)
+            return response
+        categories = CategorySerializer.select_fields(Category.objects.all(), request)
+        serializer = CategorySerializer(categories, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request, format=None):
@@ -76,6 +89,9 @@ class CategoryAPIView(APIView):
         serializer.is_valid(raise_exception=True)
         try:
             serializer.save()
+        except ValidationError:
+            # a unique name rejected by the database in optimistic mode
+            raise
         except:
             return Response('An error occured', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -89,23 +105,27 @@ class CategoryAPIView(APIView):
     #         return Response('category not found', status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, pk=None, format=None):
+        """
+        Rename a category with a single UPDATE; with its ETag in If-Match, only that version is overwritten.
+        """
         data = {'name':request.data['name']}
-        category = Category.objects.get(pk=pk)
-        if category:
-            serializer = CategorySerializer(category, data=data)
-            if serializer.is_valid():
-                try:
-                    serializer.save()
-                except:
-                    return Response('An error occured', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            else:
-                return Response(serializer.data, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            return Response('category not found', status=status.HTTP_404_NOT_FOUND)
+        # the row is not read: the serializer updates it in place
+        serializer = CategorySerializer(Category(pk=pk), data=data, context={'versions': requested_versions(request)})
+        serializer.is_valid(raise_exception=True)
+        try:
+            category = serializer.save()
+        except APIException:
+            # validation errors, 404 and 412
+            raise
+        except:
+            return Response('An error occured', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response = Response(serializer.data, status=status.HTTP_201_CREATED)
+        response['ETag'] = version_etag(category)
+        return response
 
 
-class CategoryListMixins(mixins.ListModelMixin,
+class CategoryListMixins(FastListMixin,
+                         mixins.ListModelMixin,
                          mixins.CreateModelMixin,
                          generics.GenericAPIView):
     '''
@@ -123,7 +143,8 @@ class CategoryListMixins(mixins.ListModelMixin,
         return self.create(request, *args, **kwargs)
 
 
-class CategoryDetailMixins(mixins.RetrieveModelMixin,
+class CategoryDetailMixins(ConditionalRetrieveMixin,
+                           mixins.RetrieveModelMixin,
                            mixins.UpdateModelMixin,
                            mixins.DestroyModelMixin,
                            generics.GenericAPIView):
@@ -144,7 +165,7 @@ class CategoryDetailMixins(mixins.RetrieveModelMixin,
         return self.destroy(request, *args, **kwargs)
 
 
-class CategoryListGenericApiView(generics.ListCreateAPIView):
+class CategoryListGenericApiView(ReplicaReadMixin, EagerLoadingViewMixin, generics.ListCreateAPIView):
     '''
     Even simpler way of implementing `class CategoryListMixins`.
     '''
@@ -152,8 +173,13 @@ class CategoryListGenericApiView(generics.ListCreateAPIView):
     serializer_class = CategoryModelSerializer
     pagination_class = StandardResultsSetPagination
 
+    @cache_response(Category, Notes) # shared across users, invalidated on every write
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class CategoryDetailGenericApiView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailGenericApiView(ReplicaReadMixin, ConditionalRetrieveMixin, EagerLoadingViewMixin,
+                                   generics.RetrieveUpdateDestroyAPIView):
     '''
     Even simpler way of implementing `class CategoryDetailMixins`.
     '''
@@ -161,20 +187,21 @@ class CategoryDetailGenericApiView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CategoryModelSerializer
 
 
-class CategoryView(ViewSet):
+class CategoryView(ReplicaReadMixin, StreamingListMixin, ViewSet):
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions when the methods are created within the class.
     '''
-    @method_decorator(cache_page(10)) # Cache requested url for each user for 30 minutes
-    @method_decorator(vary_on_cookie)
+    @cache_response(Category, Notes) # shared across users, invalidated on every write
     def list(self, request, format=None):
         '''
         Lists all categories.
         '''
         if request.version == 'api_v1':
-            categories = Category.objects.all()
-            serializer = CategoryModelSerializer(categories, many=True)
+            categories = CategoryModelSerializer.setup_eager_loading(Category.objects.all(), request)
+            if self.should_stream(request):
+                return self.streaming_response(request, categories.order_by('pk'), CategoryModelSerializer)
+            serializer = CategoryModelSerializer(categories, many=True, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             WrongVersion.default_detail = 'Accessing wrong api version, use api_v1'
@@ -210,16 +237,41 @@ class CategoryView(ViewSet):
 
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(KeysetOptInMixin, BulkModelMixin, FastListMixin, viewsets.ModelViewSet):
     '''
     Simpler way of implementing the `class CategoryView(ViewSet)`.
 
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions.
     There is no need to create list, retrieve etc. methods.
+    `list` pages with limit/offset, or with keyset pages from `?cursor=`.
     '''
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    bulk_serializer_class = CategorySerializer
+
+
+class AsyncCategoryViewSet(AsyncViewSetMixin, ViewSet):
+    '''
+    Async-native `list`, `retrieve` and `create` for categories, for ASGI deployments.
+    Throttling, pagination and queries are awaited instead of holding a thread.
+    '''
+    pagination_class = KeysetPagination
+
+    async def list(self, request, format=None):
+        paginator = self.pagination_class()
+        data = await afast_serialize(CategorySerializer, Category.objects.all(), request, view=self, paginator=paginator)
+        return paginator.get_paginated_response(data)
+
+    async def retrieve(self, request, pk=None, format=None):
+        category = await self.aget_object_or_404(Category.objects.all(), pk=pk)
+        serializer = CategorySerializer(category, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    async def create(self, request, format=None):
+        serializer = CategorySerializer(data=request.data)
+        await self.acreate_from(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class CategoryFunctionView:
@@ -232,8 +284,8 @@ class CategoryFunctionView:
         Function based view to list all categories.
         '''
         if request.version == 'api_v2':
-            categories = Category.objects.all()
-            serializer = CategoryModelSerializer(categories, many=True)
+            categories = CategoryModelSerializer.setup_eager_loading(Category.objects.all(), request)
+            serializer = CategoryModelSerializer(categories, many=True, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             WrongVersion.default_detail = 'Accessing wrong api version, use api_v2'
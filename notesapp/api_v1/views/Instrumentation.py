@@ -0,0 +1,54 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+
+from api_v1.helpers.compression import compression_stats
+from api_v1.helpers.instrumentation import request_stats
+from api_v1.helpers.pool import all_pool_stats
+
+
+class InstrumentationReportView(APIView):
+    '''
+    p50/p95/p99 of the query count and of the db, serializer, render, throttle
+    and total milliseconds per URL name, from the sampled requests this process
+    has served. DELETE starts over.
+    '''
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request, format=None):
+        return Response(request_stats.report(), status=status.HTTP_200_OK)
+
+    def delete(self, request, format=None):
+        request_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ConnectionPoolView(APIView):
+    '''
+    Checkouts, waits, timeouts and sizes of this process's connection pool per
+    database, since it was opened; null for a database without a pool.
+    '''
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request, format=None):
+        return Response(all_pool_stats(), status=status.HTTP_200_OK)
+
+
+class CompressionReportView(APIView):
+    '''
+    Responses compressed per URL name and coding, on the way out or from a
+    precompressed cache entry, with their compression ratio and CPU
+    milliseconds. DELETE starts over.
+    '''
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request, format=None):
+        return Response(compression_stats.report(), status=status.HTTP_200_OK)
+
+    def delete(self, request, format=None):
+        compression_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,35 +1,86 @@
-
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 
 from api_v1.models import Category, Notes
 from api_v1.serializers import NotesModelSerializer
+from api_v1.helpers.streaming import StreamingListMixin
+from api_v1.helpers.cache import cache_response
+from api_v1.helpers.conditional import conditional_get
+from api_v1.helpers.fast_read import afast_serialize, fast_serialize
+from api_v1.helpers.async_views import AsyncViewSetMixin
+from api_v1.helpers.pagination import KeysetPagination
+from api_v1.helpers.bulk import BulkModelMixin
+from api_v1.helpers.search import SearchPagination, search_notes
+from api_v1.helpers.replicas import ReplicaReadMixin
 
-class NotesViewSet(ViewSet):
+class NotesViewSet(ReplicaReadMixin, BulkModelMixin, StreamingListMixin, ViewSet):
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions when the methods are created within the class.
     '''
-    @method_decorator(cache_page(10)) # Cache requested url for each user for 30 minutes
-    @method_decorator(vary_on_cookie)
+    pagination_class = KeysetPagination
+    bulk_serializer_class = NotesModelSerializer
+
+    # the COUNT / MAX query of the ETag runs before the response cache is looked up,
+    # so a cache hit still costs that one query
+    @conditional_get(lambda view, request, *args, **kwargs: [Notes.objects.all()])
+    @cache_response(Notes) # shared across users, invalidated on every write
     def list(self, request, format=None):
         notes = Notes.objects.all()
-        serializer = NotesModelSerializer(notes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if self.should_stream(request):
+            return self.streaming_response(request, notes.order_by('pk'), NotesModelSerializer)
+        if not self.pagination_class.requested(request):
+            # every note, as before keyset pages; `?cursor=` opts in
+            return Response(fast_serialize(NotesModelSerializer, notes, request, view=self), status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        data = fast_serialize(NotesModelSerializer, notes, request, view=self, paginator=paginator)
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request, format=None):
+        '''
+        Full-text search over title and body: `?q=<terms>`, best matches first.
+        '''
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            raise ValidationError({'q': ['This query parameter is required.']})
+        notes = search_notes(Notes.objects.all(), terms)
+        paginator = SearchPagination()
+        data = fast_serialize(NotesModelSerializer, notes, request, view=self, paginator=paginator)
+        return paginator.get_paginated_response(data)
 
     def create(self, request, format=None):
-        print(request.data)
         serializer = NotesModelSerializer(data=request.data)
-        print('>>>', NotesModelSerializer())
         serializer.is_valid(raise_exception=True)
         try:
             serializer.save()
         except:
             return Response('internal server error', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncNotesViewSet(AsyncViewSetMixin, ViewSet):
+    '''
+    Async-native `list`, `retrieve` and `create` for notes, for ASGI deployments.
+    Throttling, pagination and queries are awaited instead of holding a thread.
+    '''
+    pagination_class = KeysetPagination
+
+    async def list(self, request, format=None):
+        paginator = self.pagination_class()
+        data = await afast_serialize(NotesModelSerializer, Notes.objects.all(), request, view=self, paginator=paginator)
+        return paginator.get_paginated_response(data)
+
+    async def retrieve(self, request, pk=None, format=None):
+        note = await self.aget_object_or_404(Notes.objects.all(), pk=pk)
+        serializer = NotesModelSerializer(note, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    async def create(self, request, format=None):
+        serializer = NotesModelSerializer(data=request.data)
+        await self.acreate_from(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,31 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from api_v1.models import Category, Notes
+from api_v1.serializers import SyncCategorySerializer, SyncNotesSerializer
+from api_v1.helpers.sync import SyncStream, sync
+
+
+class SyncView(APIView):
+    '''
+    Categories and notes created, updated or deleted since `?since=<token>`;
+    without a token, every row. Apply `changed` rows, then `deleted` ids, and
+    send the returned `since` next time; while `has_more` is true, sync again
+    right away. `?limit=` caps the rows and deletions of each model.
+    '''
+    streams = [
+        SyncStream('categories', Category, SyncCategorySerializer),
+        SyncStream('notes', Notes, SyncNotesSerializer),
+    ]
+    default_limit = 500
+    max_limit = 5000
+
+    def get(self, request, format=None):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        limit = max(limit, 1)
+        data = sync(self.streams, request.query_params.get('since'), limit, context={'request': request})
+        return Response(data, status=status.HTTP_200_OK)
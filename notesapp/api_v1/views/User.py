@@ -1,31 +1,37 @@
-
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.exceptions import APIException
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser
 
 from api_v1.models import Category, Notes, Person
 from api_v1.serializers import PersonModelSerializer
+from api_v1.helpers.streaming import StreamingListMixin
+from api_v1.helpers.cache import cache_response
+from api_v1.helpers.conditional import conditional_get
+from api_v1.helpers.fast_read import fast_serialize
+from api_v1.helpers.replicas import ReplicaReadMixin
 
-class UserViewSet(ViewSet):
+class UserViewSet(ReplicaReadMixin, StreamingListMixin, ViewSet):
     '''
     This viewset automatically provides `list`, `create`, `retrieve`,
     `update` and `destroy` actions when the methods are created within the class.
     '''
-    @method_decorator(cache_page(10)) # Cache requested url for each user for 30 minutes
-    @method_decorator(vary_on_cookie)
+    @cache_response(Person) # shared across users, invalidated on every write
     def list(self, request, format=None):
         persons = Person.objects.all()
-        serializer = PersonModelSerializer(persons, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if self.should_stream(request):
+            return self.streaming_response(request, persons.order_by('pk'), PersonModelSerializer)
+        return Response(fast_serialize(PersonModelSerializer, persons, request, view=self), status=status.HTTP_200_OK)
 
+    @conditional_get(lambda view, request, pk=None, **kwargs: [Person.objects.filter(pk=pk)])
     def retrieve(self, request, pk=None, format=None):
-        person = Person.objects.get(pk=pk)
-        serializer = PersonModelSerializer(person)
+        person = PersonModelSerializer.select_fields(Person.objects.all(), request).filter(pk=pk).first()
+        if person is None:
+            return Response('user not found', status=status.HTTP_404_NOT_FOUND)
+        serializer = PersonModelSerializer(person, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def create(self, request, format=None):
@@ -37,15 +43,27 @@ class UserViewSet(ViewSet):
             return Response('internal server error', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(methods=['post'], detail=False, url_path='bulk', url_name='bulk', permission_classes=[IsAdminUser])
+    def bulk(self, request, format=None):
+        '''
+        Creates a list of users in one transaction; their passwords are hashed in parallel. Admin only.
+        '''
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PersonModelSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def partial_update(self, request, pk=None, format=None):
-        person = Person.objects.get(pk=pk)
-        if person:
-            serializer = PersonModelSerializer(person, partial=True, data=request.data)
-            serializer.is_valid(raise_exception=True)
-            try:
-                serializer.save()
-            except:
-                return Response('internal server error', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            return Response('user not found', status=status.HTTP_404_NOT_FOUND)
+        # the row is not read: the serializer updates the changed names with a single UPDATE
+        serializer = PersonModelSerializer(Person(pk=pk), partial=True, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.save()
+        except APIException:
+            # 404
+            raise
+        except:
+            return Response('internal server error', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
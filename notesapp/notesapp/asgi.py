@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'notesapp.settings')
 
 application = get_asgi_application()
+
+# Fills the connection pools now rather than during the first requests. Not done in
+# wsgi.py: a server preloading the application there forks afterwards, and the
+# pool's threads do not survive a fork.
+from api_v1.helpers.pool import open_pools  # noqa: E402
+
+open_pools()
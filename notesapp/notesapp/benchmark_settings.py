@@ -0,0 +1,15 @@
+'''
+Settings for running the benchmarks against a local SQLite file instead of Postgres:
+
+    python manage.py migrate --settings notesapp.benchmark_settings
+    python manage.py benchmark --settings notesapp.benchmark_settings
+'''
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, os
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'benchmark.sqlite3'),
+    }
+}
@@ -47,18 +47,72 @@ REST_FRAMEWORK = {
     'ALLOWED_VERSIONS': ['api_v1', 'api_v2'],
     'VERSION_PARAM': 'version',
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'api_v1.helpers.throttles.AnonCounterRateThrottle',
+        'api_v1.helpers.throttles.UserCounterRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
         'user': '20/minute'
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': 5
+    'PAGE_SIZE': 5,
+    # MessagePack and CBOR for internal services: `Accept`, `Content-Type` or the .msgpack/.cbor suffix
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api_v1.helpers.renderers.MessagePackRenderer',
+        'api_v1.helpers.renderers.CBORRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api_v1.helpers.renderers.MessagePackParser',
+        'api_v1.helpers.renderers.CBORParser',
+    ],
 }
 
+# Skip unique pre-check queries and report the database's IntegrityError as the
+# validation error instead (see api_v1.helpers.validators.BatchUniqueValidator)
+OPTIMISTIC_UNIQUE_VALIDATION = False
+
+# Shared response cache of the list endpoints, invalidated on every write
+# (see api_v1.helpers.cache.cache_response)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 60 * 15
+
+# Negotiated response compression (see api_v1.helpers.compression), in order of preference;
+# br needs brotli and zstd needs zstandard, codings whose library is missing are skipped.
+# Cached responses are stored compressed in each of them too.
+RESPONSE_COMPRESSION_CODINGS = ['br', 'zstd', 'gzip']
+RESPONSE_COMPRESSION_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+# smaller bodies gain less than the compression costs
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Delta sync (see api_v1.helpers.sync): rows written in the last SYNC_SETTLE_SECONDS wait for the next
+# sync, so that transactions still committing are not skipped; tombstones of deleted rows are kept
+# SYNC_TOMBSTONE_DAYS (`manage.py prune_tombstones`), older sync tokens must start over
+SYNC_SETTLE_SECONDS = 1
+SYNC_TOMBSTONE_DAYS = 30
+
+# Where throttle counters live; point THROTTLE_CACHE_ALIAS at a cache shared by
+# all workers (e.g. Redis) so limits hold across processes
+THROTTLE_STORE = 'api_v1.helpers.throttles.CacheThrottleStore'
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Fraction of requests InstrumentationMiddleware times (Server-Timing header and
+# /api_v1/instrumentation/ report), and how many samples it keeps per URL name
+INSTRUMENTATION_SAMPLE_RATE = 0.05
+INSTRUMENTATION_SAMPLES_PER_VIEW = 1000
+
+# OpenAPI schema served by /api_v1/openapi while it matches the code; refreshed
+# with `manage.py check_schema --write`
+SCHEMA_ARTIFACT = os.path.join(os.path.dirname(BASE_DIR), 'schema.yml')
+
 MIDDLEWARE = [
+    'api_v1.helpers.instrumentation.InstrumentationMiddleware',
+    'api_v1.helpers.compression.CompressionMiddleware',
+    'api_v1.helpers.replicas.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,18 +148,51 @@ WSGI_APPLICATION = 'notesapp.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('DATABASE_NAME'),
         'USER': os.getenv('DATABASE_USERNAME'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': '127.0.0.1',
         'PORT': '5432',
+        # checks a reused connection (pooled or persistent) before handing it out
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
         'TEST': {
             'NAME': 'mytestdatabase',
         },
     }
 }
 
+# A pool of DATABASE_POOL_MIN_SIZE to DATABASE_POOL_MAX_SIZE connections per process (psycopg 3 with
+# psycopg_pool), shared by the WSGI threads and the ASGI event loop's threads; a request waits at most
+# DATABASE_POOL_TIMEOUT seconds for a connection. DATABASE_POOL=false keeps one persistent connection
+# per thread instead, for CONN_MAX_AGE seconds. Metrics: api_v1.helpers.pool.pool_stats
+if os.getenv('DATABASE_POOL', 'true').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+        'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+        # idle connections above min_size are closed after this many seconds
+        'max_idle': 300,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', 60))
+
+# Read replicas of `default`, one per host in DATABASE_REPLICA_HOSTS (comma separated).
+# Views with ReplicaReadMixin read from them (see api_v1.helpers.replicas); tests use the primary
+for index, host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(','))):
+    DATABASES['replica%d' % index] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['api_v1.helpers.replicas.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# 'round_robin' or 'least_lag'; replicas further behind than REPLICA_MAX_LAG seconds
+# (None: no limit in round robin) are skipped, their lag measured at most every interval
+REPLICA_SELECTION = 'round_robin'
+REPLICA_MAX_LAG = None
+REPLICA_LAG_CHECK_INTERVAL = 1.0
+# how long a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -125,6 +212,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords; the others still verify existing hashes,
+# which are rehashed with the first one on the next successful login. scrypt is
+# memory-hard and in the standard library; put Argon2 first when argon2-cffi is installed.
+PASSWORD_HASHERS = [
+    'api_v1.helpers.passwords.ScryptPasswordHasher',
+    'api_v1.helpers.passwords.Argon2PasswordHasher',
+    'api_v1.helpers.passwords.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Cost parameters per algorithm (see api_v1.helpers.passwords.TunableHasherMixin);
+# raising one rehashes existing passwords on login
+PASSWORD_HASHER_PARAMETERS = {
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8},
+}
+
+# Pool the bulk user endpoint hashes passwords on: 'thread' or 'process', and its size (default: one per CPU)
+PASSWORD_HASH_EXECUTOR = 'thread'
+PASSWORD_HASH_WORKERS = None
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -13,21 +13,29 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework.schemas import get_schema_view
+from rest_framework.schemas.openapi import SchemaGenerator
 from rest_framework.urlpatterns import format_suffix_patterns
 
+from api_v1.helpers.schema import CachedSchemaView, SchemaCache
+
 schema_url_patterns = [
     path('api_v1/', include('api_v1.urls')),
 ]
 
-schema_view = get_schema_view(
-    title="Notes App",
-    description="API for all things …",
-    version="1.0.0",
-    patterns=schema_url_patterns,
-)
+# built once per process, or loaded from the committed schema.yml while it is current
+# (see `manage.py check_schema`)
+schema_view = CachedSchemaView.as_view(schema_cache=SchemaCache(
+    SchemaGenerator(
+        title="Notes App",
+        description="API for all things …",
+        version="1.0.0",
+        patterns=schema_url_patterns,
+    ),
+    artifact=settings.SCHEMA_ARTIFACT,
+))
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -36,4 +44,4 @@ urlpatterns = [
     path('api_v1/openapi', schema_view)
 ]
 
-urlpatterns = format_suffix_patterns(urlpatterns, suffix_required=False, allowed=['json'])
+urlpatterns = format_suffix_patterns(urlpatterns, suffix_required=False, allowed=['json', 'ndjson', 'msgpack', 'cbor'])